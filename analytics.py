@@ -0,0 +1,119 @@
+import os
+import heapq
+import threading
+import itertools
+from collections import Counter
+from operator import itemgetter
+from urllib.parse import urlparse
+
+
+class _Shard(object):
+    # Statistics recorded by one thread since the last merge.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.words = Counter()
+        self.subdomains = Counter()
+        self.longest_page = ("", -1)
+
+
+class CrawlStats(object):
+    ''' Word, subdomain and longest page statistics. Each thread records into
+    its own shard, guarded by a lock only the merge ever contends on, and the
+    shards are folded into the totals lazily when a report is requested. '''
+    def __init__(self):
+        self.local = threading.local()
+        self.shards = list()
+        self.shards_lock = threading.Lock()
+        self.merge_lock = threading.Lock()
+        self.words = Counter()
+        self.subdomains = Counter()
+        self.longest = ("", -1)
+
+    def _shard(self):
+        shard = getattr(self.local, "shard", None)
+        if shard is None:
+            shard = self.local.shard = _Shard()
+            with self.shards_lock:
+                self.shards.append(shard)
+        return shard
+
+    def record_page(self, url: str, length: int, frequencies: dict[str: int]):
+        shard = self._shard()
+        with shard.lock:
+            shard.words.update(frequencies)
+            shard.subdomains[urlparse(url).netloc.lower()] += 1
+            if length > shard.longest_page[1]:
+                shard.longest_page = (url, length)
+
+    def merge(self):
+        # Moves everything the shards recorded into the totals.
+        with self.merge_lock:
+            with self.shards_lock:
+                shards = list(self.shards)
+            for shard in shards:
+                with shard.lock:
+                    words, shard.words = shard.words, Counter()
+                    subdomains, shard.subdomains = shard.subdomains, Counter()
+                    longest_page, shard.longest_page = shard.longest_page, ("", -1)
+                self.words.update(words)
+                self.subdomains.update(subdomains)
+                if longest_page[1] > self.longest[1]:
+                    self.longest = longest_page
+
+    def top_words(self, count: int):
+        self.merge()
+        with self.merge_lock:
+            return heapq.nlargest(count, self.words.items(), key=itemgetter(1))
+
+    def longest_page(self):
+        self.merge()
+        return self.longest
+
+    def subdomain_counts(self):
+        self.merge()
+        with self.merge_lock:
+            return dict(self.subdomains)
+
+    def word_counts(self):
+        self.merge()
+        with self.merge_lock:
+            return dict(self.words)
+
+
+class ReportWriter(threading.Thread):
+    ''' Calls write_report every interval seconds, or sooner once every_pages
+    new pages were recorded, so workers never write the report themselves. '''
+    def __init__(self, write_report, interval, every_pages):
+        self.write_report = write_report
+        self.interval = interval
+        self.every_pages = every_pages
+        self.recorded = itertools.count(1)
+        self.wake = threading.Event()
+        self.stopped = False
+        super().__init__(daemon=True)
+
+    def page_recorded(self):
+        if self.every_pages and next(self.recorded) % self.every_pages == 0:
+            self.wake.set()
+
+    def run(self):
+        while not self.stopped:
+            self.wake.wait(self.interval)
+            self.wake.clear()
+            if not self.stopped:
+                self.write_report()
+
+    def stop(self):
+        # Writes the final report once the thread is done.
+        self.stopped = True
+        self.wake.set()
+        self.join()
+        self.write_report()
+
+
+def write_atomically(path, text):
+    # Readers of the file never see a half written report.
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
@@ -0,0 +1,69 @@
+''' Crawls the same synthetic site with 1, 2, 4 and 8 partitions, every
+partition a process with its own threads, and reports pages/sec for each.
+
+    python -m benchmarks.bench_distributed --partitions 1,2,4,8 --threads 4
+'''
+import json
+import time
+import tempfile
+from argparse import ArgumentParser
+
+from crawler.distributed import run_local
+from benchmarks.fake_cache import FakeCacheServer
+from benchmarks.synthetic_site import SiteSpec, SyntheticSite
+from benchmarks.run_crawl import make_config
+
+
+def crawl(site, server, partitions, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        config = make_config(tmp, site, server.address, args)
+        config.partitions = partitions
+        # A fresh port range per run, the previous listeners may linger.
+        config.partition_base_port = args.base_port + 10 * partitions
+        requests = server.requests
+        start = time.perf_counter()
+        run_local(config, True)
+        elapsed = time.perf_counter() - start
+        with open(config.report_file, encoding="utf-8") as f:
+            report = f.read()
+    return {"partitions": partitions, "requests": server.requests - requests,
+            "elapsed_s": round(elapsed, 3),
+            "pages_per_sec": round((server.requests - requests) / elapsed, 2),
+            "report_lines": report.count("\n")}
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--partitions", default="1,2,4,8")
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--min_threads", type=int, default=None)
+    parser.add_argument("--parse_processes", type=int, default=0)
+    parser.add_argument("--storage", choices=("sqlite", "shelve"), default="sqlite")
+    parser.add_argument("--page_store", help="Keep the crawled pages in this page store.")
+    parser.add_argument("--politeness", type=float, default=0.05)
+    parser.add_argument("--hosts", type=int, default=64)
+    parser.add_argument("--pages_per_host", type=int, default=50)
+    parser.add_argument("--latency_ms", type=float, default=20.0)
+    parser.add_argument("--base_port", type=int, default=7400)
+    parser.add_argument("--output", help="Write the results as JSON to this file.")
+    args = parser.parse_args()
+
+    site = SyntheticSite(SiteSpec(
+        hosts=args.hosts, pages_per_host=args.pages_per_host,
+        latency_ms=args.latency_ms))
+    server = FakeCacheServer(site)
+    server.start()
+    results = list()
+    for partitions in (int(count) for count in args.partitions.split(",")):
+        result = crawl(site, server, partitions, args)
+        results.append(result)
+        print(f"{partitions} partitions: {result['requests']} pages in "
+              f"{result['elapsed_s']:.2f} s ({result['pages_per_sec']:.1f} pages/s)")
+    server.stop()
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
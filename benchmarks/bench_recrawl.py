@@ -0,0 +1,83 @@
+''' Crawls a synthetic site from the seeds, then changes the text of
+change_ratio of its pages and refreshes it with --recrawl a few times,
+reporting the fetches, parsed pages and time of every cycle.
+
+    python -m benchmarks.bench_recrawl --cycles 3 --change_ratio 0.1
+'''
+import json
+import time
+import tempfile
+from argparse import ArgumentParser
+
+from crawler import Crawler
+from benchmarks.fake_cache import FakeCacheServer
+from benchmarks.synthetic_site import SiteSpec, SyntheticSite
+from benchmarks.run_crawl import LatencyRecorder, make_config
+import scraper
+
+
+def crawl(config, server, recorder, restart):
+    requests, parsed = server.requests, len(recorder)
+    start = time.perf_counter()
+    Crawler(config, restart).start()
+    elapsed = time.perf_counter() - start
+    return {"requests": server.requests - requests,
+            "parsed": len(recorder) - parsed,
+            "elapsed_s": round(elapsed, 3)}
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--cycles", type=int, default=3)
+    parser.add_argument("--change_ratio", type=float, default=0.1)
+    parser.add_argument("--min_revisit", type=float, default=1.0,
+                        help="MIN_REVISIT_INTERVAL in seconds.")
+    parser.add_argument("--wait", type=float, default=None,
+                        help="Seconds between cycles, 2 * min_revisit by default.")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--min_threads", type=int, default=None)
+    parser.add_argument("--parse_processes", type=int, default=0)
+    parser.add_argument("--storage", choices=("sqlite",), default="sqlite")
+    parser.add_argument("--page_store", help="Keep the crawled pages in this page store.")
+    parser.add_argument("--politeness", type=float, default=0.0)
+    parser.add_argument("--hosts", type=int, default=20)
+    parser.add_argument("--pages_per_host", type=int, default=100)
+    parser.add_argument("--page_words", type=int, default=400)
+    parser.add_argument("--latency_ms", type=float, default=5.0)
+    parser.add_argument("--output", help="Write the results as JSON to this file.")
+    args = parser.parse_args()
+
+    site = SyntheticSite(SiteSpec(
+        hosts=args.hosts, pages_per_host=args.pages_per_host,
+        page_words=args.page_words, latency_ms=args.latency_ms,
+        change_ratio=args.change_ratio))
+    server = FakeCacheServer(site)
+    server.start()
+    recorder = LatencyRecorder()
+    scraper.scraper = recorder.wrap(scraper.scraper)
+    results = list()
+    with tempfile.TemporaryDirectory() as tmp:
+        config = make_config(tmp, site, server.address, args)
+        config.min_revisit_interval = args.min_revisit
+        result = crawl(config, server, recorder, True)
+        results.append(dict(result, cycle="cold"))
+        config.recrawl = True
+        for cycle in range(1, args.cycles + 1):
+            time.sleep(args.min_revisit * 2 if args.wait is None else args.wait)
+            site.version += 1
+            result = crawl(config, server, recorder, False)
+            results.append(dict(result, cycle=cycle))
+    server.stop()
+
+    cold = results[0]
+    for result in results:
+        print(f"{result['cycle']}: {result['requests']} fetches, "
+              f"{result['parsed']} parsed, {result['elapsed_s']:.2f} s "
+              f"({result['elapsed_s'] / cold['elapsed_s']:.0%} of cold)")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+''' Measures how long a Frontier takes to hand out its first url when
+resuming from a large save file, compared with scanning every saved url.
+--legacy writes the save file without the fetch state columns, to time the
+migration of files from before --recrawl.
+
+    python -m benchmarks.bench_resume --count 1000000
+'''
+import os
+import time
+import sqlite3
+import tempfile
+from argparse import ArgumentParser
+from configparser import ConfigParser
+
+from utils import get_urlhash
+from utils.config import Config
+from crawler.frontier import Frontier
+from crawler.storage import PENDING, COMPLETE, SQLiteStorage
+from scraper import is_valid
+
+
+def make_save_file(path, count, pending_ratio, legacy):
+    if legacy:
+        conn = sqlite3.connect(path)
+        conn.execute(
+            "CREATE TABLE urls (urlhash TEXT PRIMARY KEY, url TEXT NOT NULL, "
+            "state INTEGER NOT NULL, host TEXT NOT NULL, "
+            "discovered_at REAL NOT NULL)")
+        conn.execute("CREATE INDEX urls_state ON urls (state)")
+    else:
+        SQLiteStorage(path).close()
+        conn = sqlite3.connect(path)
+    pending_every = max(int(1 / pending_ratio), 1)
+    rows = (
+        (get_urlhash(url), url, PENDING if i % pending_every == 0 else COMPLETE,
+         f"host{i % 50}.ics.uci.edu", 0.0)
+        for i, url in ((i, f"https://host{i % 50}.ics.uci.edu/page/{i}")
+                       for i in range(count)))
+    with conn:
+        conn.executemany(
+            "INSERT INTO urls (urlhash, url, state, host, discovered_at) "
+            "VALUES (?, ?, ?, ?, ?)", rows)
+    conn.close()
+
+
+def make_config(save_file):
+    cparser = ConfigParser()
+    cparser.read_dict({
+        "IDENTIFICATION": {"USERAGENT": "IR benchmark"},
+        "CONNECTION": {"HOST": "localhost", "PORT": "0"},
+        "CRAWLER": {"SEEDURL": "https://www.ics.uci.edu", "POLITENESS": "0"},
+        "LOCAL PROPERTIES": {"SAVE": save_file, "THREADCOUNT": "1"},
+        "STORAGE": {"BACKEND": "sqlite"}})
+    return Config(cparser)
+
+
+def full_scan(save_file):
+    # What resuming did before: read every url and validate the pending ones.
+    conn = sqlite3.connect(save_file)
+    pending = [url for url, state in conn.execute("SELECT url, state FROM urls")
+               if state == PENDING and is_valid(url)]
+    conn.close()
+    return pending
+
+
+def main(count, pending_ratio, legacy):
+    with tempfile.TemporaryDirectory() as tmp:
+        save_file = os.path.join(tmp, "frontier.db")
+        make_save_file(save_file, count, pending_ratio, legacy)
+
+        start = time.perf_counter()
+        full_scan(save_file)
+        scan_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        frontier = Frontier(make_config(save_file), False)
+        first_url = frontier.get_tbd_url()
+        first_url_time = time.perf_counter() - start
+        while frontier.loading:
+            time.sleep(0.01)
+        loaded_time = time.perf_counter() - start
+        frontier.close()
+
+    print(f"{count} saved urls, {pending_ratio:.0%} pending"
+          + (", legacy schema" if legacy else ""))
+    print(f"full scan:             {scan_time:8.2f} s")
+    print(f"first url handed out:  {first_url_time:8.2f} s ({first_url})")
+    print(f"all pending loaded:    {loaded_time:8.2f} s")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--count", type=int, default=1000000)
+    parser.add_argument("--pending_ratio", type=float, default=0.1)
+    parser.add_argument("--legacy", action="store_true",
+                        help="Save file without the fetch state columns.")
+    args = parser.parse_args()
+    main(args.count, args.pending_ratio, args.legacy)
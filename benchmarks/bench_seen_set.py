@@ -0,0 +1,50 @@
+''' Measures memory per million urls and probe rate of the seen-url filter,
+through lookup, the path the frontier uses: the bloom filter and the
+fingerprint table behind it.
+
+    python -m benchmarks.bench_seen_set --count 1000000
+'''
+import time
+import tracemalloc
+from argparse import ArgumentParser
+
+from utils import get_urlhash_digest
+from crawler.seen_set import SeenSet
+
+
+def main(count, error_rate):
+    digests = [
+        get_urlhash_digest(f"https://www.ics.uci.edu/page/{i}")
+        for i in range(count)]
+    misses = [
+        get_urlhash_digest(f"https://www.cs.uci.edu/other/{i}")
+        for i in range(count)]
+
+    tracemalloc.start()
+    seen = SeenSet(count, error_rate)
+    for digest in digests:
+        seen.add(digest)
+    traced = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    answers = [seen.lookup(digest) for digest in misses]
+    elapsed = time.perf_counter() - start
+    assert all(seen.lookup(digest) for digest in digests)
+
+    per_million = 1000000 / count / 2 ** 20
+    print(f"memory: {seen.memory_bytes() * per_million:.2f} MB per million "
+          f"urls reported, {traced * per_million:.2f} MB traced "
+          f"({seen.num_hashes} hashes)")
+    print(f"new url lookups: {count / elapsed:.0f} per second")
+    print(f"bloom false positive rate: {seen.false_positives / count:.4f}")
+    print(f"wrongly seen: {answers.count(True) / count:.6f}, "
+          f"save file lookups: {answers.count(None) / count:.6f}")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--count", type=int, default=1000000)
+    parser.add_argument("--error_rate", type=float, default=0.01)
+    args = parser.parse_args()
+    main(args.count, args.error_rate)
@@ -0,0 +1,41 @@
+''' Compares url inserts per second for the shelve and sqlite save files.
+
+    python -m benchmarks.bench_storage --count 20000
+'''
+import os
+import time
+import tempfile
+from argparse import ArgumentParser
+
+from utils import get_urlhash
+from crawler.storage import ShelveStorage, SQLiteStorage
+
+
+def run(storage, urls):
+    start = time.perf_counter()
+    for url in urls:
+        urlhash = get_urlhash(url)
+        if urlhash not in storage:
+            storage.put(urlhash, url, False)
+    storage.close()
+    return len(urls) / (time.perf_counter() - start)
+
+
+def main(count, batch_size, flush_interval_ms):
+    urls = [f"https://www.ics.uci.edu/page/{i}" for i in range(count)]
+    with tempfile.TemporaryDirectory() as tmp:
+        shelve_rate = run(ShelveStorage(os.path.join(tmp, "bench.shelve")), urls)
+        sqlite_rate = run(
+            SQLiteStorage(os.path.join(tmp, "bench.db"),
+                          batch_size, flush_interval_ms / 1000), urls)
+    print(f"shelve: {shelve_rate:10.0f} urls/sec")
+    print(f"sqlite: {sqlite_rate:10.0f} urls/sec ({sqlite_rate / shelve_rate:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--count", type=int, default=20000)
+    parser.add_argument("--batch_size", type=int, default=500)
+    parser.add_argument("--flush_interval_ms", type=int, default=200)
+    args = parser.parse_args()
+    main(args.count, args.batch_size, args.flush_interval_ms)
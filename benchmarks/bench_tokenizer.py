@@ -0,0 +1,103 @@
+''' Compares the character by character tokenizer with the bulk tokenizer on
+a corpus of saved HTML pages and checks they produce the same tokens.
+
+    python -m benchmarks.bench_tokenizer --corpus path/to/pages
+'''
+import os
+import time
+import random
+from argparse import ArgumentParser
+
+from bs4 import BeautifulSoup
+
+from tokenizer import (
+    STOP_WORDS, tokenize, check_sum, compute_word_frequencies)
+
+
+def reference_tokenize(text):
+    # The tokenizer as it was before the bulk version.
+    tokens = []
+    cache = ''
+    check_sum = 0
+    for char in text:
+        if (char.isalnum() and char.isascii()):
+            cache += char.lower()
+            check_sum += ord(char.lower())
+        elif cache:
+            tokens.append(cache)
+            cache = ''
+    if (cache):
+        tokens.append(cache)
+    return (tokens, check_sum)
+
+
+def reference_compute_word_frequencies(tokens, current_words):
+    for token in tokens:
+        if (token in STOP_WORDS
+            or len(token) == 1
+            or token.isdigit()):
+            continue
+        if token in current_words.keys():
+            current_words[token] += 1
+        else:
+            current_words[token] = 1
+    return current_words
+
+
+def load_corpus(corpus):
+    if corpus:
+        for name in sorted(os.listdir(corpus)):
+            with open(os.path.join(corpus, name), "rb") as f:
+                yield f.read()
+        return
+    # Synthetic pages when no saved pages are given.
+    rng = random.Random(0)
+    words = ["Informatics", "UCI", "crawler", "2024", "naïve", "Déjà-vu",
+             "the", "research", "ICS", "x86_64", "e-mail", "a"]
+    for _ in range(200):
+        body = " ".join(rng.choice(words) for _ in range(5000))
+        yield f"<html><body><p>{body}</p></body></html>".encode("utf-8")
+
+
+def main(corpus, rounds):
+    pages = [list(BeautifulSoup(page, "html.parser").stripped_strings)
+             for page in load_corpus(corpus)]
+    size = sum(len(s.encode("utf-8")) for strings in pages for s in strings)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        before = []
+        for strings in pages:
+            tokens, total = [], 0
+            for text in strings:
+                fragment = reference_tokenize(text)
+                tokens.extend(fragment[0])
+                total += fragment[1]
+            before.append((tokens, total))
+            reference_compute_word_frequencies(tokens, dict())
+    before_rate = size * rounds / (time.perf_counter() - start) / 2 ** 20
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        after = []
+        for strings in pages:
+            tokens = tokenize(" ".join(strings))
+            after.append(tokens)
+            compute_word_frequencies(tokens, dict())
+    after_rate = size * rounds / (time.perf_counter() - start) / 2 ** 20
+
+    after = [(tokens, check_sum(tokens)) for tokens in after]
+    assert before == after, \
+        "Bulk tokenizer output differs from the reference tokenizer"
+    print(f"{len(pages)} pages, {size / 2 ** 20:.1f} MB of text")
+    print(f"before: {before_rate:8.2f} MB/s")
+    print(f"after:  {after_rate:8.2f} MB/s ({after_rate / before_rate:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--corpus", type=str, default=None,
+                        help="Directory of saved HTML pages.")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+    main(args.corpus, args.rounds)
@@ -0,0 +1,79 @@
+''' A local stand-in for the spacetime cache server. It answers
+GET /?q=<url>&u=<useragent> with the same cbor encoded dict utils.download
+expects, with the page as a pickled requests.Response, generated by a
+SyntheticSite instead of fetched from the web.
+
+    server = FakeCacheServer(SyntheticSite(SiteSpec()))
+    server.start()
+    config.cache_server = server.address
+'''
+import time
+import pickle
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+import cbor
+import requests
+
+
+def encode_response(url, status, html):
+    if html is None:
+        return cbor.dumps(
+            {"url": url, "status": status, "error": f"Synthetic {status}."})
+    resp = requests.models.Response()
+    resp.status_code = status
+    resp.url = url
+    resp._content = html.encode("utf-8")
+    resp.headers["Content-Type"] = "text/html; charset=utf-8"
+    resp.headers["Content-Length"] = str(len(resp._content))
+    return cbor.dumps(
+        {"url": url, "status": status, "response": pickle.dumps(resp)})
+
+
+class FakeCacheServer(object):
+    def __init__(self, site, host="127.0.0.1", port=0):
+        self.site = site
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+
+    @property
+    def address(self):
+        return self.server.server_address[:2]
+
+    def _handler(self):
+        cache = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive, like the real server, so the session pool is used.
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                query = parse_qs(urlsplit(self.path).query)
+                if "q" not in query or "u" not in query:
+                    self.send_error(400)
+                    return
+                url = query["q"][0]
+                with cache.lock:
+                    cache.requests += 1
+                time.sleep(cache.site.latency(url))
+                status, html = cache.site.page(url)
+                body = encode_response(url, status, html)
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
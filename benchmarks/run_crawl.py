@@ -0,0 +1,220 @@
+''' Crawls a synthetic site end to end through a local fake cache server, so
+no registration or network is needed, and reports pages/sec, fetch to scrape
+latency, peak RSS and the frontier size over time.
+
+    python -m benchmarks.run_crawl --hosts 20 --pages_per_host 200 \\
+        --output results.json --baseline previous.json
+
+The JSON results include the commit, so runs of different commits can be
+compared with --baseline.
+'''
+import os
+import json
+import time
+import tempfile
+import threading
+import subprocess
+from argparse import ArgumentParser
+from configparser import ConfigParser
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from utils import metrics
+from utils.config import Config
+from crawler import Crawler
+from benchmarks.fake_cache import FakeCacheServer
+from benchmarks.synthetic_site import SiteSpec, SyntheticSite
+import scraper
+
+
+class LatencyRecorder(object):
+    ''' Wraps scraper.scraper to record, per page, the download latency plus
+    the time until its links are returned. '''
+    def __init__(self):
+        self.latencies = list()
+        self.lock = threading.Lock()
+
+    def wrap(self, scrape):
+        def timed_scraper(url, resp, parse_pool=None):
+            start = time.perf_counter()
+            try:
+                return scrape(url, resp, parse_pool)
+            finally:
+                latency = (resp.latency or 0) + time.perf_counter() - start
+                with self.lock:
+                    self.latencies.append(latency)
+        return timed_scraper
+
+    def __len__(self):
+        return len(self.latencies)
+
+    def percentile(self, q):
+        with self.lock:
+            latencies = sorted(self.latencies)
+        if not latencies:
+            return None
+        return latencies[min(int(q * len(latencies)), len(latencies) - 1)]
+
+
+def current_rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+            text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def make_config(tmp, site, cache_server, args):
+    cparser = ConfigParser()
+    cparser.read_dict({
+        "IDENTIFICATION": {"USERAGENT": "IR benchmark"},
+        "CONNECTION": {"HOST": "localhost", "PORT": "0"},
+        "CRAWLER": {"SEEDURL": ",".join(site.seed_urls()),
+                    "POLITENESS": str(args.politeness)},
+        "LOCAL PROPERTIES": {"SAVE": os.path.join(tmp, "frontier.db"),
+                             "THREADCOUNT": str(args.threads),
+                             "MIN_THREADCOUNT": str(args.min_threads or args.threads),
+                             "PARSE_PROCESSES": str(args.parse_processes)},
+        "REPORT": {"FILE": os.path.join(tmp, "report.txt")},
+        "PAGE_STORE": {"DIRECTORY": args.page_store or ""},
+        "STORAGE": {"BACKEND": args.storage}})
+    config = Config(cparser)
+    # What launch.py gets from the registration with the real cache server.
+    config.cache_server = cache_server
+    return config
+
+
+def sample(crawler, recorder, start, samples, interval, stopped):
+    while not stopped.wait(interval):
+        samples.append({
+            "time": round(time.perf_counter() - start, 3),
+            "pages": len(recorder),
+            "frontier": len(crawler.frontier.to_be_downloaded),
+            "rss_mb": current_rss_mb()})
+
+
+def run(args):
+    spec = SiteSpec(
+        hosts=args.hosts, pages_per_host=args.pages_per_host,
+        fan_out=args.fan_out, page_words=args.page_words,
+        trap_ratio=args.trap_ratio, trap_depth=args.trap_depth,
+        duplicate_ratio=args.duplicate_ratio, error_ratio=args.error_ratio,
+        server_error_ratio=args.server_error_ratio,
+        latency_ms=args.latency_ms, seed=args.seed)
+    site = SyntheticSite(spec)
+    server = FakeCacheServer(site)
+    server.start()
+    recorder = LatencyRecorder()
+    scraper.scraper = recorder.wrap(scraper.scraper)
+    samples = list()
+    stopped = threading.Event()
+    with tempfile.TemporaryDirectory() as tmp:
+        config = make_config(tmp, site, server.address, args)
+        if args.engine == "asyncio":
+            from crawler.async_engine import AsyncCrawler
+            crawler = AsyncCrawler(config, True)
+        else:
+            crawler = Crawler(config, True)
+        start = time.perf_counter()
+        sampler = threading.Thread(
+            target=sample, daemon=True,
+            args=(crawler, recorder, start, samples, args.sample_interval,
+                  stopped))
+        sampler.start()
+        crawler.start()
+        elapsed = time.perf_counter() - start
+        stopped.set()
+        sampler.join()
+    server.stop()
+
+    p50, p99 = recorder.percentile(0.5), recorder.percentile(0.99)
+    return {
+        "commit": current_commit(),
+        "engine": args.engine,
+        "threads": args.threads,
+        "min_threads": args.min_threads,
+        "parse_processes": args.parse_processes,
+        "storage": args.storage,
+        "site": spec.to_dict(),
+        "pages": len(recorder),
+        "requests": server.requests,
+        "elapsed_s": round(elapsed, 3),
+        "pages_per_sec": round(len(recorder) / elapsed, 2),
+        "latency_p50_ms": round(p50 * 1000, 2) if p50 is not None else None,
+        "latency_p99_ms": round(p99 * 1000, 2) if p99 is not None else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "samples": samples,
+        "stages": metrics.registry.snapshot()["histograms"]}
+
+
+def compare(results, baseline):
+    for key in ("pages_per_sec", "latency_p50_ms", "latency_p99_ms",
+                "peak_rss_mb"):
+        new, old = results.get(key), baseline.get(key)
+        if new is None or not old:
+            continue
+        print(f"{key:16} {old:10.2f} -> {new:10.2f} ({new / old - 1:+.1%})")
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--engine", choices=("threads", "asyncio"), default="threads")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--min_threads", type=int, default=None,
+                        help="Let the pool shrink down to this many fetchers.")
+    parser.add_argument("--parse_processes", type=int, default=0)
+    parser.add_argument("--storage", choices=("sqlite", "shelve"), default="sqlite")
+    parser.add_argument("--page_store", help="Keep the crawled pages in this page store.")
+    parser.add_argument("--politeness", type=float, default=0.0)
+    parser.add_argument("--hosts", type=int, default=20)
+    parser.add_argument("--pages_per_host", type=int, default=200)
+    parser.add_argument("--fan_out", type=int, default=10)
+    parser.add_argument("--page_words", type=int, default=400)
+    parser.add_argument("--trap_ratio", type=float, default=0.02)
+    parser.add_argument("--trap_depth", type=int, default=50)
+    parser.add_argument("--duplicate_ratio", type=float, default=0.05)
+    parser.add_argument("--error_ratio", type=float, default=0.02)
+    parser.add_argument("--server_error_ratio", type=float, default=0.0)
+    parser.add_argument("--latency_ms", type=float, default=20.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sample_interval", type=float, default=1.0)
+    parser.add_argument("--output", help="Write the results as JSON to this file.")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare with.")
+    args = parser.parse_args()
+
+    results = run(args)
+    print(f"{results['pages']} pages in {results['elapsed_s']:.2f} s "
+          f"({results['pages_per_sec']:.1f} pages/s), latency p50 "
+          f"{results['latency_p50_ms']} ms, p99 {results['latency_p99_ms']} ms, "
+          f"peak RSS {results['peak_rss_mb']:.1f} MB")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=1)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+''' A deterministic synthetic web graph. Every page is generated from its url
+and the seed, so the same settings always produce the same crawl.
+
+Regular pages live at http://host<h>.ics.uci.edu/page/<n>. Some of them link
+into a calendar trap (/calendar/<day>, trap_depth pages deep, each day the
+same as the others but for a few words, like a real calendar), some are
+exact copies of another page of the same host, and some return 404 or 503.
+Every time version is increased, change_ratio of the regular pages get new
+text, while their links stay the same.
+'''
+import math
+import random
+from urllib.parse import urlsplit
+
+WORDS = [f"word{i}" for i in range(20000)]
+
+
+class SiteSpec(object):
+    def __init__(self, hosts=20, pages_per_host=200, fan_out=10,
+                 cross_host_ratio=0.2, page_words=400, page_words_sigma=0.5,
+                 trap_ratio=0.02, trap_depth=50, duplicate_ratio=0.05,
+                 error_ratio=0.02, server_error_ratio=0.0, latency_ms=20.0,
+                 latency_sigma=0.5, change_ratio=0.1, seed=0):
+        self.hosts = hosts
+        self.pages_per_host = pages_per_host
+        self.fan_out = fan_out
+        self.cross_host_ratio = cross_host_ratio
+        # Page sizes and latencies are log-normal around these medians.
+        self.page_words = page_words
+        self.page_words_sigma = page_words_sigma
+        self.trap_ratio = trap_ratio
+        self.trap_depth = trap_depth
+        self.duplicate_ratio = duplicate_ratio
+        self.error_ratio = error_ratio
+        # Drawn per request, not per url, like a struggling server.
+        self.server_error_ratio = server_error_ratio
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.change_ratio = change_ratio
+        self.seed = seed
+
+    def to_dict(self):
+        return dict(vars(self))
+
+
+class SyntheticSite(object):
+    def __init__(self, spec):
+        self.spec = spec
+        self.version = 0
+
+    def host_name(self, host):
+        return f"host{host}.ics.uci.edu"
+
+    def seed_urls(self):
+        return [f"http://{self.host_name(host)}/page/0"
+                for host in range(self.spec.hosts)]
+
+    def _rng(self, url):
+        return random.Random(f"{self.spec.seed}:{url}")
+
+    def latency(self, url):
+        # Seconds the server waits before answering for this url.
+        if self.spec.latency_ms <= 0:
+            return 0.0
+        rng = self._rng("latency:" + url)
+        return rng.lognormvariate(
+            math.log(self.spec.latency_ms / 1000), self.spec.latency_sigma)
+
+    def page(self, url):
+        ''' Returns (status, html) for the url. html is None for errors. '''
+        parts = urlsplit(url)
+        host = parts.netloc
+        if not host.startswith("host") or not host.endswith(".ics.uci.edu"):
+            return 404, None
+        segments = parts.path.strip("/").split("/")
+        if len(segments) != 2 or not segments[1].isdigit():
+            return 404, None
+        kind, number = segments[0], int(segments[1])
+        if random.random() < self.spec.server_error_ratio:
+            return 503, None
+        rng = self._rng(url)
+        if kind == "calendar":
+            if number > self.spec.trap_depth:
+                return 404, None
+            links = [f"http://{host}/calendar/{number + 1}"]
+            return 200, self._calendar_html(host, rng, links)
+        if kind != "page" or number >= self.spec.pages_per_host:
+            return 404, None
+        if rng.random() < self.spec.error_ratio:
+            return 404, None
+        if number and rng.random() < self.spec.duplicate_ratio:
+            # Same content and links as a page of the same host.
+            original = f"http://{host}/page/{rng.randrange(number)}"
+            return self.page(original)
+        links = self._links(rng, host)
+        version = self._content_version(url)
+        if version:
+            rng = self._rng(f"{version}:{url}")
+        return 200, self._html(rng, links)
+
+    def _content_version(self, url):
+        # The last version that changed the text of the page, 0 if none did.
+        for version in range(self.version, 0, -1):
+            if self._rng(f"change{version}:{url}").random() < self.spec.change_ratio:
+                return version
+        return 0
+
+    def _links(self, rng, host):
+        links = list()
+        for _ in range(self.spec.fan_out):
+            if rng.random() < self.spec.cross_host_ratio:
+                other = self.host_name(rng.randrange(self.spec.hosts))
+            else:
+                other = host
+            links.append(
+                f"http://{other}/page/{rng.randrange(self.spec.pages_per_host)}")
+        if rng.random() < self.spec.trap_ratio:
+            links.append(f"http://{host}/calendar/0")
+        return links
+
+    def _html(self, rng, links):
+        count = max(10, int(rng.lognormvariate(
+            math.log(self.spec.page_words), self.spec.page_words_sigma)))
+        return self._render(
+            [rng.choice(WORDS) for _ in range(count)], links)
+
+    def _calendar_html(self, host, rng, links):
+        # The words of the host's calendar with 5% of them changed per day.
+        template = self._rng(f"calendar:{host}")
+        words = [template.choice(WORDS) for _ in range(self.spec.page_words)]
+        words = [rng.choice(WORDS) if rng.random() < 0.05 else word
+                 for word in words]
+        return self._render(words, links)
+
+    def _render(self, words, links):
+        words = " ".join(words)
+        anchors = "".join(f'<a href="{link}">link</a> ' for link in links)
+        return (f"<html><head><title>page</title></head><body><p>{words}</p>"
+                f"{anchors}</body></html>")
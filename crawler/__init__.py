@@ -1,27 +1,63 @@
-from utils import get_logger
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from utils import get_logger, configure_logging
+from utils.metrics import MetricsExporter
 from crawler.frontier import Frontier
 from crawler.worker import Worker
-from utils.politness_delay import PolitnessDelay
+from crawler.rate_control import FetchGate, WorkerPoolController
+import scraper
+
+def get_parse_pool(config):
+    # Worker threads hand pages to these processes for parsing. Spawn is used
+    # because forking a process that already runs threads is not safe.
+    if config.parse_processes <= 0:
+        return None
+    return ProcessPoolExecutor(
+        config.parse_processes, mp_context=multiprocessing.get_context("spawn"))
 
 class Crawler(object):
     def __init__(self, config, restart, frontier_factory=Frontier, worker_factory=Worker):
         self.config = config
+        configure_logging(config)
         self.logger = get_logger("CRAWLER")
+        scraper.configure(config, restart)
         self.frontier = frontier_factory(config, restart)
         self.workers = list()
         self.worker_factory = worker_factory
-        self.politness_delay = PolitnessDelay(self.config.time_delay)
+        self.parse_pool = get_parse_pool(config)
+        self.metrics = MetricsExporter(config)
+        # THREADCOUNT workers are started, and between MIN_THREADCOUNT and
+        # THREADCOUNT of them may download at once.
+        self.gate = FetchGate(config.threads_count)
+        self.pool_controller = None
+        if config.min_threads_count < config.threads_count:
+            self.pool_controller = WorkerPoolController(
+                self.gate, self.frontier, config.min_threads_count,
+                config.threads_count)
 
     def start_async(self):
+        self.metrics.start()
         self.workers = [
-            self.worker_factory(worker_id, self.config, self.frontier, self.politness_delay)
+            self.worker_factory(
+                worker_id, self.config, self.frontier, self.parse_pool,
+                self.gate, self.pool_controller)
             for worker_id in range(self.config.threads_count)]
         for worker in self.workers:
             worker.start()
+        if self.pool_controller:
+            self.pool_controller.start()
 
     def start(self):
         self.start_async()
         self.join()
+        if self.pool_controller:
+            self.pool_controller.stop()
+        if self.parse_pool:
+            self.parse_pool.shutdown()
+        scraper.finish()
+        self.frontier.close()
+        self.metrics.stop()
 
     def join(self):
         for worker in self.workers:
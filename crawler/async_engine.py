@@ -0,0 +1,149 @@
+import time
+import asyncio
+import cbor
+
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+
+from utils import get_logger, configure_logging, metrics
+from utils.metrics import MetricsExporter
+from utils.download import CONNECTION_ERROR_STATUS, TOO_LARGE_STATUS
+from utils.response import Response
+from crawler import get_parse_pool
+from crawler.frontier import Frontier
+from crawler.scheduler import get_host
+from crawler.worker import still_valid, process_response
+import scraper
+
+
+class AsyncCrawler(object):
+    ''' Runs every fetch on one event loop instead of one thread per worker.
+    Fetches are bounded overall by [ASYNC] CONCURRENCY and per host by
+    PER_HOST, on top of the politeness delay enforced by the frontier.
+    Decoding, scraping and frontier updates run in a thread pool so they
+    never block the loop. '''
+    def __init__(self, config, restart, frontier_factory=Frontier):
+        self.config = config
+        configure_logging(config)
+        self.logger = get_logger("ASYNC-CRAWLER", "Worker")
+        scraper.configure(config, restart)
+        self.frontier = frontier_factory(config, restart)
+        self.parse_pool = get_parse_pool(config)
+        self.host_slots = dict()
+        self.in_flight = set()
+        self.metrics = MetricsExporter(config)
+        metrics.gauge("crawler_in_flight_urls", lambda: len(self.in_flight))
+
+    def start(self):
+        self.metrics.start()
+        asyncio.run(self._crawl())
+        if self.parse_pool:
+            self.parse_pool.shutdown()
+        scraper.finish()
+        self.frontier.close()
+        self.metrics.stop()
+
+    async def _crawl(self):
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.config.async_concurrency)
+        in_flight = self.in_flight
+        connector = aiohttp.TCPConnector(limit=self.config.async_concurrency)
+        timeout = aiohttp.ClientTimeout(
+            sock_connect=self.config.connect_timeout,
+            sock_read=self.config.read_timeout)
+        with ThreadPoolExecutor(self.config.threads_count) as executor:
+            async with aiohttp.ClientSession(
+                    connector=connector, timeout=timeout) as session:
+                while True:
+                    await slots.acquire()
+                    url, wait = self.frontier.pop_ready_url()
+                    if url is None:
+                        slots.release()
+                        # Nothing queued or in flight in the frontier.
+                        if wait is None and self.frontier.is_finished():
+                            self.logger.info("Frontier is empty. Stopping Crawler.")
+                            break
+                        # Either a host becomes ready after wait seconds, or
+                        # an in flight page adds new urls when it completes.
+                        if in_flight:
+                            await asyncio.wait(
+                                set(in_flight), timeout=wait,
+                                return_when=asyncio.FIRST_COMPLETED)
+                        else:
+                            await asyncio.sleep(wait or 0.1)
+                        continue
+                    task = loop.create_task(
+                        self._process(session, executor, url, slots))
+                    in_flight.add(task)
+                    task.add_done_callback(in_flight.discard)
+
+    async def _process(self, session, executor, url, slots):
+        try:
+            if not still_valid(url, self.logger):
+                self.frontier.mark_url_complete(url)
+                return
+            host = get_host(url)
+            host_slot = self.host_slots.get(host)
+            if host_slot is None:
+                host_slot = self.host_slots[host] = asyncio.Semaphore(
+                    self.config.async_per_host)
+            async with host_slot:
+                start = time.perf_counter()
+                status, content, error = await self._fetch(session, url)
+                latency = time.perf_counter() - start
+            await asyncio.get_running_loop().run_in_executor(
+                executor, self._scrape, url, status, content, error, latency)
+        except Exception as e:
+            self.logger.error(f"Failed to process {url}: {e!r}")
+            # Otherwise the frontier would count it as in flight forever.
+            self.frontier.mark_url_complete(url)
+        finally:
+            slots.release()
+
+    async def _fetch(self, session, url):
+        host, port = self.config.cache_server
+        try:
+            async with session.get(
+                    f"http://{host}:{port}/",
+                    params=[("q", f"{url}"), ("u", f"{self.config.user_agent}")]
+                    ) as resp:
+                max_bytes = self.config.max_download_bytes
+                too_large = (
+                    TOO_LARGE_STATUS, None,
+                    f"Response larger than {max_bytes} bytes with url {url}.")
+                if resp.content_length and resp.content_length > max_bytes:
+                    return too_large
+                chunks = list()
+                size = 0
+                async for chunk in resp.content.iter_chunked(64 * 1024):
+                    size += len(chunk)
+                    if size > max_bytes:
+                        return too_large
+                    chunks.append(chunk)
+                return resp.status, b"".join(chunks), None
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            return CONNECTION_ERROR_STATUS, None, (
+                f"Spacetime connection error {e!r} with url {url}.")
+
+    def _scrape(self, url, status, content, error, latency):
+        fetch_state = None
+        try:
+            resp = None
+            if content:
+                try:
+                    resp = Response(cbor.loads(content))
+                except (EOFError, ValueError):
+                    pass
+            if resp is None:
+                error = error or f"Spacetime Response error {status} with url {url}."
+                self.logger.error(error)
+                resp = Response({"error": error, "status": status, "url": url})
+            resp.latency = latency
+            fetch_state = process_response(
+                url, resp, self.config, self.frontier, self.logger,
+                self.parse_pool)
+        except Exception as e:
+            self.logger.error(f"Failed to process {url}: {e!r}")
+        # Marked complete even if it failed, as Worker.run does.
+        self.frontier.mark_url_complete(url, fetch_state)
@@ -0,0 +1,147 @@
+''' Distributed crawling. Each of [DISTRIBUTED] PARTITIONS processes owns the
+hosts a consistent hash assigns to it, with its own frontier, save file and
+politeness delays. Links to hosts of another partition are forwarded to it.
+
+    python launch.py                  # every partition on this machine
+    python launch.py --partition 2    # one partition, ADDRESSES lists all
+
+Each partition writes its statistics next to its report, and they are
+merged into config.report_file. With partitions on several machines copy
+the .json files to one of them and merge them with
+
+    python -m crawler.distributed report.txt report.part*.json
+'''
+import os
+import sys
+import copy
+import json
+import heapq
+import multiprocessing
+from functools import lru_cache
+from collections import Counter
+from operator import itemgetter
+
+from crawler import Crawler
+from crawler.frontier import Frontier
+from crawler.partition import HashRing, LinkRouter
+from crawler.scheduler import get_host
+from analytics import write_atomically
+import scraper
+
+
+def _partition_path(path, partition):
+    root, ext = os.path.splitext(path)
+    return f"{root}.part{partition}{ext}"
+
+
+def stats_path(report_file):
+    return os.path.splitext(report_file)[0] + ".json"
+
+
+def partition_config(config, partition):
+    # The config of one partition, with files of its own.
+    config = copy.copy(config)
+    config.partition = partition
+    config.save_file = _partition_path(config.save_file, partition)
+    config.report_file = _partition_path(config.report_file, partition)
+    if config.page_store_dir:
+        config.page_store_dir = _partition_path(config.page_store_dir, partition)
+    if config.metrics_file:
+        config.metrics_file = _partition_path(config.metrics_file, partition)
+    if config.metrics_port:
+        config.metrics_port += partition
+    return config
+
+
+class PartitionedFrontier(Frontier):
+    ''' A frontier that only keeps the urls of its own hosts and forwards the
+    others to their owner. get_tbd_url blocks while this partition is out of
+    urls, as others may still send some, until partition 0 ends the crawl. '''
+    def __init__(self, config, restart):
+        self.ring = HashRing(config.partitions)
+        self.owner = lru_cache(maxsize=config.filter_cache_size)(self.ring.owner)
+        self.router = None
+        # Every partition reads the same seeds and keeps its own.
+        super().__init__(config, restart)
+        self.router = LinkRouter(
+            config, self._add_links, self.is_idle, self._stopped)
+
+    def add_url(self, url):
+        owner = self.owner(get_host(url))
+        if owner == self.config.partition:
+            super().add_url(url)
+        elif self.router is not None:
+            self.router.forward(owner, url)
+
+    def _add_links(self, urls):
+        # Urls forwarded by other partitions.
+        for url in urls:
+            super().add_url(url)
+
+    def is_idle(self):
+        with self.lock:
+            return self._out_of_work()
+
+    def _finished(self):
+        # Running out of urls here does not end the crawl, the router does.
+        return self.router is not None and self.router.stopped.is_set()
+
+    def _stopped(self):
+        # Wakes the workers waiting in get_tbd_url so they see the crawl is
+        # over.
+        with self.lock:
+            self.has_work.notify_all()
+
+    def close(self):
+        self.router.close()
+        super().close()
+
+
+def run_partition(config, partition, restart):
+    config = partition_config(config, partition)
+    crawler = Crawler(config, restart, frontier_factory=PartitionedFrontier)
+    crawler.start()
+    scraper.write_stats(stats_path(config.report_file))
+
+
+def run_local(config, restart):
+    # Runs every partition as a process on this machine, then merges their
+    # reports.
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=run_partition, args=(config, partition, restart))
+        for partition in range(config.partitions)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    merge_reports(
+        [stats_path(partition_config(config, partition).report_file)
+         for partition in range(config.partitions)],
+        config.report_file)
+
+
+def merge_reports(paths, report_file):
+    words = Counter()
+    subdomains = Counter()
+    longest_page = ("", -1)
+    unique_count = exact_duplicates = near_duplicates = 0
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            stats = json.load(f)
+        unique_count += stats["unique_urls"]
+        exact_duplicates += stats["exact_duplicates"]
+        near_duplicates += stats["near_duplicates"]
+        words.update(stats["words"])
+        subdomains.update(stats["subdomains"])
+        if stats["longest_page"][1] > longest_page[1]:
+            longest_page = tuple(stats["longest_page"])
+    top_words = heapq.nlargest(
+        scraper.COMMON_WORDS_COUNT, words.items(), key=itemgetter(1))
+    write_atomically(report_file, scraper.format_report(
+        unique_count, exact_duplicates, near_duplicates, longest_page,
+        top_words, dict(subdomains)))
+
+
+if __name__ == "__main__":
+    merge_reports(sys.argv[2:], sys.argv[1])
@@ -1,28 +1,45 @@
 import os
-import shelve
-import sqlite3 
+import time
 
-from threading import Thread, RLock
+from threading import Thread, RLock, Condition
 from queue import Queue, Empty
 
-from utils import get_logger, get_urlhash, normalize
+from utils import get_logger, get_urlhash_digest, normalize, metrics
 from scraper import is_valid
-
-_original_connect = sqlite3.connect
-
-def _patched_connect(args, **kwargs):
-    kwargs['check_same_thread'] = False
-    return _original_connect(args, **kwargs)
-
-sqlite3.connect = _patched_connect
+from crawler.scheduler import HostScheduler, get_host
+from crawler.storage import get_storage, remove_save_file, SEEN_SNAPSHOT_SUFFIX
+from crawler.seen_set import SeenSet
+from crawler.revisit import RevisitPolicy, content_hash
 
 class Frontier(object):
     def __init__(self, config, restart):
         self.logger = get_logger("FRONTIER")
         self.config = config
-        self.to_be_downloaded = list()
-        self.lock = RLock()
-        
+        self.to_be_downloaded = HostScheduler(
+            self.config.time_delay, self.config.max_time_delay,
+            self.config.backoff, self.config.latency_backoff)
+        self.seen = SeenSet(
+            self.config.seen_capacity, self.config.seen_error_rate)
+        self.revisits = RevisitPolicy(
+            self.config.min_revisit_interval, self.config.max_revisit_interval)
+        # With --recrawl, urls due before this are visited again.
+        self.started = time.time()
+        lock = RLock()
+        self.lock = metrics.TimedLock(lock, "frontier")
+        # Notified when urls are added, and when the crawl may be over.
+        self.has_work = Condition(lock)
+        # Urls handed out and not marked complete yet.
+        self.in_flight = set()
+        self.loading = False
+        metrics.gauge(
+            "crawler_frontier_queued_urls", lambda: len(self.to_be_downloaded))
+        metrics.gauge(
+            "crawler_frontier_queued_hosts",
+            lambda: len(self.to_be_downloaded.queues))
+        metrics.gauge(
+            "crawler_backed_off_hosts",
+            lambda: len(self.to_be_downloaded.delays))
+
         if not os.path.exists(self.config.save_file) and not restart:
             # Save file does not exist, but request to load save.
             self.logger.info(
@@ -32,14 +49,15 @@ class Frontier(object):
             # Save file does exists, but request to start from seed.
             self.logger.info(
                 f"Found save file {self.config.save_file}, deleting it.")
-            os.remove(self.config.save_file)
+            remove_save_file(self.config.save_file)
         # Load existing save file, or create one if it does not exist.
-        self.save = shelve.open(self.config.save_file)
+        self.save = get_storage(self.config)
         if restart:
             for url in self.config.seed_urls:
                 self.add_url(url)
         else:
             # Set the frontier state with contents of save file.
+            self._load_seen_set()
             self._parse_save_file()
             if not self.save:
                 for url in self.config.seed_urls:
@@ -47,38 +65,184 @@ class Frontier(object):
 
     def _parse_save_file(self):
         ''' This function can be overridden for alternate saving techniques. '''
-        total_count = len(self.save)
+        # Only pending urls are read, in batches by a background thread, so
+        # crawling starts as soon as the first batch is in.
+        self.loading = True
+        Thread(target=self._load_pending, daemon=True).start()
+
+    def _add_pending(self, urls):
+        if self.config.revalidate_on_resume:
+            # The filter rules may have changed since the urls were saved.
+            urls = [url for url in urls if is_valid(url)]
+        with self.lock:
+            for url in urls:
+                self.to_be_downloaded.add(url)
+            self.has_work.notify_all()
+        return len(urls)
+
+    def _load_pending(self):
         tbd_count = 0
-        for url, completed in self.save.values():
-            if not completed and is_valid(url):
-                self.to_be_downloaded.append(url)
-                tbd_count += 1
-        self.logger.info(
-            f"Found {tbd_count} urls to be downloaded from {total_count} "
-            f"total urls discovered.")
-
-    def get_tbd_url(self):
+        for batch in self.save.pending_batches(self.config.resume_batch_size):
+            tbd_count += self._add_pending(batch)
+        self.logger.info(f"Found {tbd_count} urls to be downloaded.")
+        if self.config.recrawl:
+            due_count = 0
+            for batch in self.save.due_batches(
+                    self.started, self.config.resume_batch_size):
+                due_count += self._add_pending(batch)
+            self.logger.info(f"Found {due_count} urls due for a revisit.")
         with self.lock:
-            try:
-                return self.to_be_downloaded.pop()
-            except IndexError:
-                return None
+            self.loading = False
+            self.has_work.notify_all()
+
+    def _load_seen_set(self):
+        # A snapshot is only written on a clean shutdown. It is removed once
+        # loaded, so after a crash the filter is rebuilt from the save file.
+        # The fingerprints are not in the snapshot and always rebuilt.
+        snapshot = self.config.save_file + SEEN_SNAPSHOT_SUFFIX
+        loaded = self.seen.load(snapshot)
+        if os.path.exists(snapshot):
+            os.remove(snapshot)
+        self.seen.ready = loaded
+        self.seen.complete = False
+        Thread(target=self._rebuild_seen_set, args=(not loaded,),
+               daemon=True).start()
+
+    def _rebuild_seen_set(self, fill_filter):
+        # New urls are added to the filter while this runs, so it is filled
+        # under the lock, in chunks to let the workers through.
+        add = self.seen.add if fill_filter else self.seen.add_fingerprint
+        batch = list()
+        for urlhash in self.save.keys():
+            batch.append(bytes.fromhex(urlhash))
+            if len(batch) >= self.config.resume_batch_size:
+                with self.lock:
+                    for digest in batch:
+                        add(digest)
+                batch = list()
+        with self.lock:
+            for digest in batch:
+                add(digest)
+            self.seen.ready = True
+            self.seen.complete = True
+
+    def _is_saved(self, digest):
+        # The bloom filter and fingerprints answer "new" or "seen", the save
+        # file is only read when they cannot tell.
+        saved = self.seen.lookup(digest)
+        if saved is not None:
+            return saved
+        if digest.hex() in self.save:
+            return True
+        if self.seen.ready:
+            self.seen.false_positives += 1
+        return False
+
+    def _out_of_work(self):
+        # Nothing queued, nothing in flight and nothing left to load. Called
+        # with the lock held.
+        return (not len(self.to_be_downloaded) and not self.in_flight
+                and not self.loading)
+
+    def _finished(self):
+        # Whether get_tbd_url should end the crawl, overridden by frontiers
+        # that can still receive urls from elsewhere.
+        return self._out_of_work()
+
+    def is_finished(self):
+        with self.lock:
+            return self._finished()
+
+    def pop_ready_url(self):
+        ''' Non blocking get_tbd_url. Returns (url, None) if a host is ready,
+        (None, seconds until one is) or (None, None) if nothing is queued. '''
+        with self.lock:
+            url, wait = self.to_be_downloaded.pop()
+            if url is not None:
+                self.in_flight.add(url)
+        if url is None and wait is None and self.loading:
+            # More urls are still being read from the save file.
+            wait = 0.1
+        return url, wait
+
+    def get_tbd_url(self, timeout=None):
+        ''' Blocks until a url whose host is past its politeness delay can be
+        handed out. Returns None once the crawl is over, or after timeout
+        seconds without a url. The url counts as in flight until
+        mark_url_complete. '''
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.lock:
+            while True:
+                url, wait = self.to_be_downloaded.pop()
+                if url is not None:
+                    self.in_flight.add(url)
+                    return url
+                if self._finished():
+                    # Wakes the other waiting workers so they stop too.
+                    self.has_work.notify_all()
+                    return None
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return None
+                    wait = remaining if wait is None else min(wait, remaining)
+                # Until a host is ready, or add_url or mark_url_complete
+                # notify. The lock is released while waiting.
+                self.has_work.wait(wait)
+
+    def record_fetch(self, url, status, latency):
+        # Lets the scheduler slow down hosts that error out or slow down.
+        with self.lock:
+            self.to_be_downloaded.record(get_host(url), status, latency)
+
+    def record_content(self, url, status, content):
+        ''' Hashes what url returned and schedules its next visit. Returns
+        whether it changed since the last time url was completed, if not the
+        page does not have to be parsed again, and the fetch state to pass
+        to mark_url_complete once the page was handled. Nothing is saved
+        before that, so a page that fails or is cut short by a crash is
+        parsed again the next time. '''
+        urlhash = get_urlhash_digest(url).hex()
+        new_hash = content_hash(status, content)
+        return self.revisits.update(
+            self.save.fetch_state(urlhash), new_hash, time.time())
+
+    def ready_hosts(self):
+        with self.lock:
+            return self.to_be_downloaded.ready_hosts()
 
     def add_url(self, url):
         url = normalize(url)
-        urlhash = get_urlhash(url)
+        digest = get_urlhash_digest(url)
         with self.lock:
-            if urlhash not in self.save:
-                self.save[urlhash] = (url, False)
-                self.save.sync()
-                self.to_be_downloaded.append(url)
-    
-    def mark_url_complete(self, url):
-        urlhash = get_urlhash(url)
+            if not self._is_saved(digest):
+                self.seen.add(digest)
+                self.save.put(digest.hex(), url, False)
+                self.to_be_downloaded.add(url)
+                self.has_work.notify()
+
+    def mark_url_complete(self, url, fetch_state=None):
+        # fetch_state comes from record_content, None if the page failed.
+        digest = get_urlhash_digest(url)
         with self.lock:
-            if urlhash not in self.save:
+            if not self._is_saved(digest):
                 # This should not happen.
                 self.logger.error(
                     f"Completed url {url}, but have not seen it before.")
-            self.save[urlhash] = (url, True)
-            self.save.sync()
+                self.seen.add(digest)
+            self.save.put(digest.hex(), url, True)
+            # After the url, so a commit in between can only lose the hash,
+            # and the page is parsed again.
+            if fetch_state is not None:
+                self.save.put_fetch(digest.hex(), fetch_state)
+            self.in_flight.discard(url)
+            if self._finished():
+                self.has_work.notify_all()
+
+    def close(self):
+        # Flushes any buffered writes to the save file.
+        with self.lock:
+            self.logger.info(f"Seen set: {self.seen.stats()}")
+            self.save.close()
+            if self.seen.ready:
+                self.seen.save(self.config.save_file + SEEN_SNAPSHOT_SUFFIX)
@@ -0,0 +1,237 @@
+import time
+import bisect
+from hashlib import blake2b
+from collections import OrderedDict
+from threading import Thread, Condition, Lock, Event
+from multiprocessing.connection import Listener, Client
+from multiprocessing import AuthenticationError
+
+from utils import get_logger
+
+# Forwarded urls remembered per process, so the same link found on many
+# pages is only sent to its owner once.
+RECENTLY_FORWARDED = 100000
+# Seconds between termination waves, and how long a wave waits for replies.
+WAVE_INTERVAL = 0.5
+WAVE_TIMEOUT = 5.0
+
+
+def partition_addresses(config):
+    # (host, port) each partition listens on.
+    if config.partition_addresses:
+        addresses = list()
+        for address in config.partition_addresses:
+            host, _, port = address.rpartition(":")
+            addresses.append((host, int(port)))
+        assert len(addresses) == config.partitions, (
+            "[DISTRIBUTED] ADDRESSES needs one address per partition")
+        return addresses
+    return [("127.0.0.1", config.partition_base_port + partition)
+            for partition in range(config.partitions)]
+
+
+class HashRing(object):
+    ''' Consistent hashing of hosts onto partitions. Every partition has
+    replicas points on the ring so hosts spread evenly, and changing the
+    number of partitions only moves the hosts of the affected points. '''
+    def __init__(self, partitions, replicas=100):
+        points = sorted(
+            (self._hash(f"{partition}-{replica}"), partition)
+            for partition in range(partitions) for replica in range(replicas))
+        self.keys = [key for key, _ in points]
+        self.owners = [owner for _, owner in points]
+
+    @staticmethod
+    def _hash(value):
+        return int.from_bytes(
+            blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+    def owner(self, host):
+        index = bisect.bisect(self.keys, self._hash(host)) % len(self.keys)
+        return self.owners[index]
+
+
+class LinkRouter(object):
+    ''' Sends urls owned by other partitions to them in batches, hands the
+    urls they send here to on_links, and calls on_stop when the crawl ends.
+
+    Partition 0 also decides when the whole crawl is over: it asks every
+    partition whether it is idle and how many urls it sent and received.
+    Once two waves in a row find every partition idle, with the same counts
+    and as many urls received as sent, nothing is left in flight anywhere
+    and every partition is told to stop. '''
+    def __init__(self, config, on_links, is_idle, on_stop):
+        self.logger = get_logger(f"ROUTER-{config.partition}", "Router")
+        self.config = config
+        self.partition = config.partition
+        self.addresses = partition_addresses(config)
+        self.peers = [partition for partition in range(config.partitions)
+                      if partition != self.partition]
+        self.on_links = on_links
+        self.is_idle = is_idle
+        self.on_stop = on_stop
+
+        self.cond = Condition()
+        self.outgoing = {partition: list() for partition in self.peers}
+        self.recent = OrderedDict()
+        self.sending = 0
+        self.sent = 0
+        self.received = 0
+
+        self.connections = dict()
+        self.send_locks = {partition: Lock() for partition in self.peers}
+        self.statuses = dict()
+        self.status_cond = Condition()
+        self.stopped = Event()
+
+        self.listener = Listener(
+            self.addresses[self.partition],
+            authkey=self.config.partition_authkey)
+        Thread(target=self._accept_loop, daemon=True).start()
+        Thread(target=self._send_loop, daemon=True).start()
+        if self.partition == 0:
+            Thread(target=self._coordinate, daemon=True).start()
+
+    def forward(self, partition, url):
+        with self.cond:
+            if url in self.recent:
+                self.recent.move_to_end(url)
+                return
+            self.recent[url] = None
+            if len(self.recent) > RECENTLY_FORWARDED:
+                self.recent.popitem(last=False)
+            batch = self.outgoing[partition]
+            batch.append(url)
+            if len(batch) >= self.config.forward_batch_size:
+                self.cond.notify()
+
+    def status(self):
+        # (idle, sent, received) of this partition.
+        with self.cond:
+            sent, received = self.sent, self.received
+            pending = self.sending or any(self.outgoing.values())
+        return not pending and self.is_idle(), sent, received
+
+    def _send(self, partition, message):
+        # Retries until it is sent, a peer may still be starting up.
+        with self.send_locks[partition]:
+            while True:
+                conn = self.connections.get(partition)
+                try:
+                    if conn is None:
+                        conn = self.connections[partition] = Client(
+                            self.addresses[partition],
+                            authkey=self.config.partition_authkey)
+                    conn.send(message)
+                    return True
+                except OSError as e:
+                    if conn is not None:
+                        self.logger.error(f"Lost partition {partition}: {e}")
+                        self.connections.pop(partition, None)
+                        conn.close()
+                if self.stopped.is_set():
+                    return False
+                time.sleep(0.5)
+
+    def _send_loop(self):
+        while not self.stopped.is_set():
+            with self.cond:
+                self.cond.wait_for(
+                    lambda: self.stopped.is_set() or any(
+                        len(batch) >= self.config.forward_batch_size
+                        for batch in self.outgoing.values()),
+                    timeout=self.config.forward_interval)
+                batches = {partition: batch
+                           for partition, batch in self.outgoing.items() if batch}
+                for partition in batches:
+                    self.outgoing[partition] = list()
+                # Counted until sent, so the partition does not look idle.
+                self.sending = sum(len(batch) for batch in batches.values())
+            for partition, batch in batches.items():
+                sent = self._send(partition, ("links", batch))
+                with self.cond:
+                    self.sending -= len(batch)
+                    if sent:
+                        self.sent += len(batch)
+
+    def _accept_loop(self):
+        while True:
+            try:
+                conn = self.listener.accept()
+            except AuthenticationError as e:
+                self.logger.error(f"Rejected a connection: {e}")
+                continue
+            except OSError:
+                break
+            Thread(target=self._receive, args=(conn,), daemon=True).start()
+
+    def _receive(self, conn):
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                break
+            kind = message[0]
+            if kind == "links":
+                self.on_links(message[1])
+                with self.cond:
+                    self.received += len(message[1])
+            elif kind == "probe":
+                self._send(0, ("status", message[1], self.partition) + self.status())
+            elif kind == "status":
+                _, wave, partition, idle, sent, received = message
+                with self.status_cond:
+                    self.statuses[(wave, partition)] = (idle, sent, received)
+                    self.status_cond.notify_all()
+            elif kind == "stop":
+                self._stop()
+        conn.close()
+
+    def _collect(self, wave):
+        # Statuses of every partition for this wave, or None on a timeout.
+        for partition in self.peers:
+            self._send(partition, ("probe", wave))
+        with self.status_cond:
+            complete = self.status_cond.wait_for(
+                lambda: all((wave, partition) in self.statuses
+                            for partition in self.peers),
+                timeout=WAVE_TIMEOUT)
+            statuses = [self.statuses.get((wave, partition))
+                        for partition in self.peers]
+            self.statuses.clear()
+        if not complete:
+            return None
+        return statuses + [self.status()]
+
+    def _coordinate(self):
+        previous = None
+        wave = 0
+        while not self.stopped.wait(WAVE_INTERVAL):
+            wave += 1
+            statuses = self._collect(wave)
+            if statuses is None or not all(idle for idle, _, _ in statuses):
+                previous = None
+                continue
+            counts = (sum(sent for _, sent, _ in statuses),
+                      sum(received for _, _, received in statuses))
+            if counts[0] == counts[1] and counts == previous:
+                self.logger.info(
+                    f"Every partition is idle, {counts[0]} urls forwarded. "
+                    f"Stopping the crawl.")
+                for partition in self.peers:
+                    self._send(partition, ("stop",))
+                self._stop()
+                break
+            previous = counts
+
+    def _stop(self):
+        self.stopped.set()
+        self.on_stop()
+
+    def close(self):
+        self.stopped.set()
+        with self.cond:
+            self.cond.notify_all()
+        self.listener.close()
+        for conn in list(self.connections.values()):
+            conn.close()
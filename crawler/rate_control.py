@@ -0,0 +1,104 @@
+import threading
+
+from utils import get_logger, metrics
+
+# Weight of the newest download in the average latency.
+LATENCY_WEIGHT = 0.1
+# The pool shrinks once downloads take this many times longer than the
+# fastest the cache server has been.
+LATENCY_LIMIT = 2.0
+# The fastest latency slowly drifts up, so a lasting slowdown of the cache
+# server is eventually accepted as the new normal.
+BASELINE_DRIFT = 1.01
+
+
+class FetchGate(object):
+    ''' A semaphore whose limit can change while it is held. Workers hold it
+    while downloading, so the limit is the number of active fetchers. '''
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self.cond = threading.Condition()
+
+    def __enter__(self):
+        with self.cond:
+            self.cond.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+
+    def __exit__(self, *exc_info):
+        with self.cond:
+            self.active -= 1
+            self.cond.notify()
+
+    def resize(self, limit):
+        with self.cond:
+            self.limit = limit
+            self.cond.notify_all()
+
+
+class WorkerPoolController(threading.Thread):
+    ''' Every interval seconds, sets the number of active fetchers between
+    minimum and maximum. It grows by one while there are more ready hosts
+    than fetchers, unless download latency rose well above the best seen,
+    as that means the cache server is saturated. Otherwise it shrinks by a
+    quarter when the cache server is saturated, and by one when fewer hosts
+    are ready than fetchers. '''
+    def __init__(self, gate, frontier, minimum, maximum, interval=1.0):
+        self.logger = get_logger("POOL")
+        self.gate = gate
+        self.frontier = frontier
+        self.minimum = max(1, min(minimum, maximum))
+        self.maximum = maximum
+        self.interval = interval
+        self.latency = None
+        self.baseline = None
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        metrics.gauge("crawler_active_fetchers", lambda: self.gate.active)
+        metrics.gauge("crawler_fetcher_limit", lambda: self.gate.limit)
+        super().__init__(daemon=True)
+
+    def observe(self, latency):
+        if latency is None:
+            return
+        with self.lock:
+            if self.latency is None:
+                self.latency = latency
+            else:
+                self.latency += (latency - self.latency) * LATENCY_WEIGHT
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.adjust()
+
+    def adjust(self):
+        with self.lock:
+            latency = self.latency
+        limit = self.gate.limit
+        demand = self.frontier.ready_hosts() + self.gate.active
+        if latency is not None:
+            if self.baseline is None or latency < self.baseline:
+                self.baseline = latency
+            else:
+                self.baseline *= BASELINE_DRIFT
+        saturated = (
+            latency is not None and latency > self.baseline * LATENCY_LIMIT)
+        # Demand first: while more hosts are ready than fetchers, a high
+        # latency only stops the pool from growing. A mix of cached and
+        # uncached responses would otherwise shrink it to the minimum.
+        if demand > limit:
+            if not saturated:
+                limit += 1
+        elif saturated:
+            limit = int(limit * 0.75)
+        elif demand < limit:
+            limit -= 1
+        limit = max(self.minimum, min(limit, self.maximum))
+        if limit != self.gate.limit:
+            self.logger.info(
+                f"{limit} active fetchers for {demand} ready hosts, "
+                f"latency {latency or 0:.3f}s.")
+            self.gate.resize(limit)
+
+    def stop(self):
+        self.stopped.set()
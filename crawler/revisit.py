@@ -0,0 +1,38 @@
+from hashlib import blake2b
+
+
+def content_hash(status, content):
+    # Hash of what the cache server returned for a url. content may be a
+    # memoryview, or None for responses without a page.
+    digest = blake2b(status.to_bytes(4, "little", signed=True), digest_size=16)
+    if content is not None:
+        digest.update(content)
+    return digest.digest()
+
+
+class RevisitPolicy(object):
+    ''' Decides when a crawled url is due again. Its change rate is estimated
+    as (changes + 0.5) / time since it was first fetched, and the next visit
+    is one expected change away, between min_interval and max_interval
+    seconds. A page that never changes is visited half as often every time,
+    one that changes on every visit settles at the rate it changes at. '''
+    def __init__(self, min_interval, max_interval):
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+
+    def update(self, state, new_hash, now):
+        ''' state is (content hash, first fetched at, changes) as stored after
+        the last completed fetch, or None if there was none. Returns whether
+        the content changed, and (content hash, first fetched at, fetched at,
+        changes, next visit) to store. '''
+        if state is None:
+            changed, first_fetched_at, changes = True, now, 0
+        else:
+            old_hash, first_fetched_at, changes = state
+            changed = new_hash != old_hash
+            if changed:
+                changes += 1
+        observed = max(now - first_fetched_at, self.min_interval)
+        interval = observed / (changes + 0.5)
+        interval = min(max(interval, self.min_interval), self.max_interval)
+        return changed, (new_hash, first_fetched_at, now, changes, now + interval)
@@ -0,0 +1,129 @@
+import time
+import heapq
+from collections import deque
+from urllib.parse import urlsplit
+
+from utils.download import BACKOFF_STATUSES
+
+
+def get_host(url):
+    return urlsplit(url).netloc.lower()
+
+
+# Smallest delay a host gets after an error, even when POLITENESS is 0. A
+# host whose delay shrinks below it is back to POLITENESS.
+MIN_BACKOFF_DELAY = 0.5
+# Weight of the newest fetch in the average latency of a host.
+LATENCY_WEIGHT = 0.2
+# Slow fetches in a row before a host is backed off for its latency, so one
+# outlier does not throttle it.
+SLOW_FETCHES = 3
+
+
+class HostScheduler(object):
+    ''' Keeps one queue of urls per host and a min-heap of hosts keyed by
+    the time their next fetch is allowed. Not thread safe, the owner is
+    expected to hold its own lock.
+
+    Every host waits at least delay seconds between fetches. record() backs
+    a host off, up to max_delay, after errors or when several fetches in a
+    row answer much slower than it used to, and brings it back towards delay
+    once it recovers. '''
+    def __init__(self, delay, max_delay=None, backoff=2.0, latency_backoff=2.0):
+        self.delay = delay
+        self.max_delay = max(max_delay or delay, delay)
+        self.backoff = backoff
+        self.latency_backoff = latency_backoff
+        self.queues = dict()
+        self.next_allowed = dict()
+        self.ready_heap = list()
+        self.size = 0
+        # Only hosts slower than delay, and the average latency per host.
+        self.delays = dict()
+        self.latencies = dict()
+        # Number of slow fetches in a row, per host.
+        self.slow = dict()
+
+    def __len__(self):
+        return self.size
+
+    def add(self, url):
+        host = get_host(url)
+        queue = self.queues.get(host)
+        if queue is None:
+            queue = self.queues[host] = deque()
+        if not queue:
+            # Host was idle, put it back on the heap.
+            heapq.heappush(
+                self.ready_heap, (self.next_allowed.get(host, 0), host))
+        queue.append(url)
+        self.size += 1
+
+    def pop(self, now=None):
+        ''' Returns (url, None) if some host is ready, (None, wait) with the
+        seconds until the next host is ready, or (None, None) if empty. '''
+        if not self.ready_heap:
+            return None, None
+        if now is None:
+            now = time.time()
+        while True:
+            ready_at, host = self.ready_heap[0]
+            allowed = self.next_allowed.get(host, 0)
+            if ready_at >= allowed:
+                break
+            # The host was backed off after it was put on the heap.
+            heapq.heapreplace(self.ready_heap, (allowed, host))
+        if ready_at > now:
+            return None, ready_at - now
+        heapq.heappop(self.ready_heap)
+        queue = self.queues[host]
+        url = queue.popleft()
+        self.size -= 1
+        self.next_allowed[host] = now + self.delays.get(host, self.delay)
+        if queue:
+            heapq.heappush(self.ready_heap, (self.next_allowed[host], host))
+        else:
+            del self.queues[host]
+        return url, None
+
+    def record(self, host, status, latency, now=None):
+        ''' Adapts the delay of host to how its last fetch went. '''
+        if now is None:
+            now = time.time()
+        delay = self.delays.get(host, self.delay)
+        average = self.latencies.get(host)
+        slow = (status not in BACKOFF_STATUSES and latency is not None
+                and average is not None
+                and latency > average * self.latency_backoff)
+        if slow:
+            self.slow[host] = self.slow.get(host, 0) + 1
+        else:
+            self.slow.pop(host, None)
+        if status in BACKOFF_STATUSES:
+            delay = max(delay, MIN_BACKOFF_DELAY) * self.backoff
+        elif slow:
+            if self.slow[host] >= SLOW_FETCHES:
+                # Waits at least as long as the host takes to answer.
+                delay = max(delay, average) * self.backoff ** 0.5
+        else:
+            delay = delay / self.backoff
+            if delay < max(self.delay, MIN_BACKOFF_DELAY):
+                delay = self.delay
+        delay = min(delay, self.max_delay)
+        if latency is not None:
+            self.latencies[host] = latency if average is None else (
+                average + (latency - average) * LATENCY_WEIGHT)
+        if delay > self.delay:
+            self.delays[host] = delay
+            # Counted from now, the fetch that went wrong may have been slow.
+            self.next_allowed[host] = max(
+                self.next_allowed.get(host, 0), now + delay)
+        else:
+            self.delays.pop(host, None)
+
+    def ready_hosts(self, now=None):
+        # Number of hosts that could be fetched from right now.
+        if now is None:
+            now = time.time()
+        return sum(1 for ready_at, host in self.ready_heap
+                   if max(ready_at, self.next_allowed.get(host, 0)) <= now)
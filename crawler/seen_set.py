@@ -0,0 +1,179 @@
+import os
+import math
+import struct
+from array import array
+
+SNAPSHOT_HEADER = struct.Struct("<QQQ")
+# Check of a fingerprint shared by several saved urls. Checks are 7 bits.
+COLLIDED = 0x80
+
+
+class FingerprintTable(object):
+    ''' Open addressed table from 64-bit fingerprints to 7-bit checks, in an
+    array of fingerprints and a bytearray of checks: 9 bytes per slot, and
+    at most half of the slots are used. Sized for capacity fingerprints
+    and doubled when it fills up. Fingerprint 0 marks an empty slot. '''
+    def __init__(self, capacity):
+        size = 1024
+        while size < 2 * capacity:
+            size *= 2
+        self.count = 0
+        self._allocate(size)
+
+    def _allocate(self, size):
+        self.mask = size - 1
+        self.keys = array("Q", bytes(8 * size))
+        self.checks = bytearray(size)
+
+    def __len__(self):
+        return self.count
+
+    def _slot(self, fingerprint):
+        # The slot holding fingerprint, or the empty one it would go to.
+        keys, mask = self.keys, self.mask
+        slot = fingerprint & mask
+        while True:
+            key = keys[slot]
+            if key == fingerprint or not key:
+                return slot
+            slot = (slot + 1) & mask
+
+    def get(self, fingerprint):
+        slot = self._slot(fingerprint)
+        return self.checks[slot] if self.keys[slot] else None
+
+    def add(self, fingerprint, check):
+        slot = self._slot(fingerprint)
+        if not self.keys[slot]:
+            self.keys[slot] = fingerprint
+            self.checks[slot] = check
+            self.count += 1
+            if 2 * self.count > len(self.keys):
+                self._grow()
+        elif self.checks[slot] != check:
+            self.checks[slot] = COLLIDED
+
+    def _grow(self):
+        keys, checks = self.keys, self.checks
+        self._allocate(2 * len(keys))
+        for key, check in zip(keys, checks):
+            if key:
+                slot = self._slot(key)
+                self.keys[slot] = key
+                self.checks[slot] = check
+
+    def memory_bytes(self):
+        return len(self.keys) * self.keys.itemsize + len(self.checks)
+
+
+def _fingerprint(digest):
+    # 64-bit fingerprint and 7-bit check of a url digest, 0 is reserved.
+    return int.from_bytes(digest[:8], "little") or 1, digest[8] & 0x7f
+
+
+class SeenSet(object):
+    ''' Bloom filter over raw url digests, backed by an exact table of the
+    64-bit fingerprint of every saved url with 7 more bits of its digest
+    (FingerprintTable). A bloom miss means the url is definitely new, and
+    the table settles the bloom hits in memory. Only urls whose fingerprint
+    is shared by two saved urls, or probed while the table is being rebuilt,
+    have to be looked up in the save file. Not thread safe, the owner is
+    expected to hold its own lock. '''
+    def __init__(self, capacity, error_rate):
+        capacity = max(capacity, 1)
+        self.num_bits = max(
+            int(-capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.num_hashes = max(
+            int(round(self.num_bits / capacity * math.log(2))), 1)
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+        self.fingerprints = FingerprintTable(capacity)
+        # Until the filter holds every saved url, all probes are "maybe".
+        self.ready = True
+        # Until the table holds every saved url, bloom hits go to the save file.
+        self.complete = True
+        # Counters to measure how often the save file is still consulted.
+        self.probes = 0
+        self.maybe_hits = 0
+        self.false_positives = 0
+
+    def _positions(self, digest):
+        # Double hashing: the sha256 digest already gives independent bits.
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:16], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, digest):
+        for pos in self._positions(digest):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+        self.add_fingerprint(digest)
+
+    def add_fingerprint(self, digest):
+        # Only adds the url to the fingerprint table, when the filter already has it.
+        self.fingerprints.add(*_fingerprint(digest))
+
+    def _in_filter(self, digest):
+        for pos in self._positions(digest):
+            if not self.bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def __contains__(self, digest):
+        # The bloom filter alone: False if new, True if maybe seen.
+        self.probes += 1
+        if self.ready and not self._in_filter(digest):
+            return False
+        self.maybe_hits += 1
+        return True
+
+    def lookup(self, digest):
+        ''' True if the url was seen, False if it is new and None if only the
+        save file can tell. '''
+        self.probes += 1
+        if self.ready and not self._in_filter(digest):
+            return False
+        if self.complete:
+            fingerprint, check = _fingerprint(digest)
+            stored = self.fingerprints.get(fingerprint)
+            if stored is None:
+                self.false_positives += 1
+            if stored != COLLIDED:
+                return stored == check
+        self.maybe_hits += 1
+        return None
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(SNAPSHOT_HEADER.pack(self.num_bits, self.num_hashes, self.count))
+            f.write(self.bits)
+
+    def load(self, path):
+        # Returns False if there is no snapshot matching this filter's size.
+        if not os.path.exists(path):
+            return False
+        with open(path, "rb") as f:
+            header = f.read(SNAPSHOT_HEADER.size)
+            if len(header) != SNAPSHOT_HEADER.size:
+                return False
+            num_bits, num_hashes, count = SNAPSHOT_HEADER.unpack(header)
+            if (num_bits, num_hashes) != (self.num_bits, self.num_hashes):
+                return False
+            bits = f.read()
+        if len(bits) != len(self.bits):
+            return False
+        self.bits = bytearray(bits)
+        self.count = count
+        return True
+
+    def memory_bytes(self):
+        return len(self.bits) + self.fingerprints.memory_bytes()
+
+    def stats(self):
+        return (
+            f"{self.count} urls in {self.memory_bytes()} bytes "
+            f"({self.num_hashes} hashes), {self.probes} probes, "
+            f"{self.maybe_hits} checked on disk, "
+            f"{self.false_positives} false positives, "
+            f"{len(self.fingerprints)} fingerprints")
@@ -0,0 +1,357 @@
+import os
+import time
+import shelve
+import sqlite3
+
+from threading import Thread, Condition
+from contextlib import contextmanager
+
+from utils import get_logger, metrics
+from crawler.scheduler import get_host
+
+PENDING = 0
+COMPLETE = 1
+
+# Fetch state of crawled urls, see SQLiteStorage.put_fetch.
+FETCH_COLUMNS = (
+    ("content_hash", "BLOB"),
+    ("first_fetched_at", "REAL"),
+    ("fetched_at", "REAL"),
+    ("changes", "INTEGER NOT NULL DEFAULT 0"),
+    ("next_visit", "REAL"))
+
+# user_version of a save file from before the fetch state was kept, until
+# its crawled urls are given a next visit.
+BACKFILL_NEXT_VISIT = 1
+
+# The seen-url filter is written next to the save file on a clean shutdown.
+SEEN_SNAPSHOT_SUFFIX = ".seen"
+
+
+def get_storage(config):
+    if config.storage == "shelve":
+        return ShelveStorage(config.save_file)
+    if config.storage == "sqlite":
+        return SQLiteStorage(
+            config.save_file, config.batch_size, config.flush_interval)
+    raise ValueError(f"Unknown storage backend {config.storage}.")
+
+
+@contextmanager
+def _shared_sqlite_connections():
+    # Since Python 3.13 shelve may be backed by dbm.sqlite3, whose connection
+    # is then used by every worker thread. Only the shelve is opened with
+    # check_same_thread off, other sqlite3.connect calls are left alone.
+    original_connect = sqlite3.connect
+
+    def connect(*args, **kwargs):
+        kwargs["check_same_thread"] = False
+        return original_connect(*args, **kwargs)
+
+    sqlite3.connect = connect
+    try:
+        yield
+    finally:
+        sqlite3.connect = original_connect
+
+
+def remove_save_file(path):
+    # SQLite in WAL mode keeps two side files next to the database.
+    # The seen set snapshot only makes sense with its save file.
+    for suffix in ("", "-wal", "-shm", SEEN_SNAPSHOT_SUFFIX):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+class ShelveStorage(object):
+    ''' The original storage: one shelve write and sync per url. '''
+    def __init__(self, path):
+        with _shared_sqlite_connections():
+            self.save = shelve.open(path)
+
+    def __contains__(self, urlhash):
+        return urlhash in self.save
+
+    def __len__(self):
+        return len(self.save)
+
+    def put(self, urlhash, url, completed):
+        with metrics.timer("persist"):
+            self.save[urlhash] = (url, completed)
+            self.save.sync()
+
+    def keys(self):
+        return self.save.keys()
+
+    def values(self):
+        return self.save.values()
+
+    def fetch_state(self, urlhash):
+        # A shelve only knows whether a url was crawled, so every page counts
+        # as new and --recrawl needs the sqlite backend.
+        return None
+
+    def put_fetch(self, urlhash, state):
+        pass
+
+    def due_batches(self, now, batch_size):
+        return iter(())
+
+    def pending_batches(self, batch_size):
+        # A shelve has no index, so this still scans every url.
+        batch = list()
+        for url, completed in self.save.values():
+            if not completed:
+                batch.append(url)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = list()
+        if batch:
+            yield batch
+
+    def close(self):
+        self.save.close()
+
+
+class SQLiteStorage(object):
+    ''' Stores urls in a SQLite table in WAL mode. Writes are buffered in
+    memory and group-committed by a writer thread once batch_size rows are
+    waiting or flush_interval seconds have passed, whichever comes first.
+
+    Crawled urls also keep a hash of their content, when they were first and
+    last fetched, how often their content changed and when they are due
+    again, for --recrawl. '''
+    def __init__(self, path, batch_size=500, flush_interval=0.2):
+        self.logger = get_logger("STORAGE")
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # Rows not yet committed, and rows being committed right now.
+        self.pending = dict()
+        self.flushing = dict()
+        # Same for the fetch state of crawled urls.
+        self.pending_fetches = dict()
+        self.flushing_fetches = dict()
+        self.cond = Condition()
+        self.put_lock = metrics.TimedLock(self.cond, "storage")
+        self.closed = False
+        self.flush_waiters = 0
+
+        self.conn = self._connect()
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS urls ("
+            "urlhash TEXT PRIMARY KEY, "
+            "url TEXT NOT NULL, "
+            "state INTEGER NOT NULL, "
+            "host TEXT NOT NULL, "
+            "discovered_at REAL NOT NULL)")
+        # Save files from before the fetch state was kept.
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(urls)")}
+        for column, definition in FETCH_COLUMNS:
+            if column not in columns:
+                self.conn.execute(
+                    f"ALTER TABLE urls ADD COLUMN {column} {definition}")
+        if "next_visit" not in columns:
+            # Their urls were crawled before, so they are due right away. Only
+            # --recrawl needs that, so due_batches fills it in.
+            self.conn.execute(f"PRAGMA user_version = {BACKFILL_NEXT_VISIT}")
+        # Lets a resume read only the pending urls, in rowid order.
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS urls_state ON urls (state)")
+        self.conn.commit()
+
+        self.writer = Thread(target=self._write_loop, daemon=True)
+        self.writer.start()
+        metrics.gauge(
+            "crawler_storage_buffered_rows",
+            lambda: self._buffered() + len(self.flushing)
+            + len(self.flushing_fetches))
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Every commit is fsynced, so durability is bounded by flush_interval.
+        conn.execute("PRAGMA synchronous=FULL")
+        return conn
+
+    def __contains__(self, urlhash):
+        with self.cond:
+            if urlhash in self.pending or urlhash in self.flushing:
+                return True
+        return self.conn.execute(
+            "SELECT 1 FROM urls WHERE urlhash = ?", (urlhash,)
+        ).fetchone() is not None
+
+    def __len__(self):
+        self.flush()
+        return self.conn.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+
+    def put(self, urlhash, url, completed):
+        row = (urlhash, url, COMPLETE if completed else PENDING,
+               get_host(url), time.time())
+        with self.put_lock:
+            self.pending[urlhash] = row
+            if self._buffered() >= self.batch_size:
+                self.cond.notify_all()
+
+    def fetch_state(self, urlhash):
+        ''' (content hash, first fetched at, changes) after the last completed
+        fetch of the url, or None if there was none. '''
+        with self.cond:
+            state = (self.pending_fetches.get(urlhash)
+                     or self.flushing_fetches.get(urlhash))
+        if state is None:
+            state = self.conn.execute(
+                "SELECT content_hash, first_fetched_at, fetched_at, changes, "
+                "next_visit FROM urls WHERE urlhash = ? AND state = ?",
+                (urlhash, COMPLETE)).fetchone()
+        if state is None or state[0] is None:
+            return None
+        content_hash, first_fetched_at, _, changes, _ = state
+        return content_hash, first_fetched_at, changes
+
+    def put_fetch(self, urlhash, state):
+        # state is (content hash, first fetched at, fetched at, changes,
+        # next visit), committed together with the url rows.
+        with self.put_lock:
+            self.pending_fetches[urlhash] = state
+            if self._buffered() >= self.batch_size:
+                self.cond.notify_all()
+
+    def _buffered(self):
+        return len(self.pending) + len(self.pending_fetches)
+
+    def keys(self):
+        # Uses its own connection so it can be iterated from another thread.
+        self.flush()
+        conn = self._connect()
+        try:
+            for urlhash, in conn.execute("SELECT urlhash FROM urls"):
+                yield urlhash
+        finally:
+            conn.close()
+
+    def values(self):
+        self.flush()
+        cursor = self.conn.execute("SELECT url, state FROM urls")
+        for url, state in cursor:
+            yield url, state == COMPLETE
+
+    def due_batches(self, now, batch_size):
+        # Crawled urls whose next visit is before now, most overdue first,
+        # read like pending_batches.
+        self.flush()
+        conn = self._connect()
+        try:
+            with conn:
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+                if version == BACKFILL_NEXT_VISIT:
+                    conn.execute(
+                        "UPDATE urls SET next_visit = 0 "
+                        "WHERE state = ? AND next_visit IS NULL", (COMPLETE,))
+                    conn.execute("PRAGMA user_version = 0")
+                # Built on the first --recrawl, so crawls without one do not
+                # pay for it on every write.
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS urls_next_visit "
+                    "ON urls (state, next_visit)")
+            last = (float("-inf"), 0)
+            while True:
+                rows = conn.execute(
+                    "SELECT next_visit, rowid, url FROM urls "
+                    "WHERE state = ? AND next_visit <= ? "
+                    "AND (next_visit, rowid) > (?, ?) "
+                    "ORDER BY next_visit, rowid LIMIT ?",
+                    (COMPLETE, now) + last + (batch_size,)).fetchall()
+                if not rows:
+                    break
+                last = rows[-1][:2]
+                yield [url for _, _, url in rows]
+        finally:
+            conn.close()
+
+    def pending_batches(self, batch_size):
+        # Reads pending urls through the state index, one batch per query on
+        # its own connection, so it can be consumed from another thread.
+        self.flush()
+        conn = self._connect()
+        try:
+            last_rowid = 0
+            while True:
+                rows = conn.execute(
+                    "SELECT rowid, url FROM urls "
+                    "WHERE state = ? AND rowid > ? ORDER BY rowid LIMIT ?",
+                    (PENDING, last_rowid, batch_size)).fetchall()
+                if not rows:
+                    break
+                last_rowid = rows[-1][0]
+                yield [url for _, url in rows]
+        finally:
+            conn.close()
+
+    def flush(self):
+        ''' Blocks until everything put so far is committed. '''
+        with self.cond:
+            self.flush_waiters += 1
+            self.cond.notify_all()
+            while (self.pending or self.flushing or self.pending_fetches
+                   or self.flushing_fetches):
+                self.cond.wait()
+            self.flush_waiters -= 1
+
+    def close(self):
+        self.flush()
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        self.writer.join()
+        self.conn.close()
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            with self.cond:
+                # Give the batch a chance to fill up before committing.
+                deadline = time.time() + self.flush_interval
+                while not self.closed and not (
+                        self._buffered() and (self.flush_waiters
+                        or self._buffered() >= self.batch_size)):
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    self.cond.wait(remaining)
+                if not self._buffered():
+                    if self.closed:
+                        break
+                    continue
+                self.flushing, self.pending = self.pending, dict()
+                self.flushing_fetches, self.pending_fetches = (
+                    self.pending_fetches, dict())
+            start = time.perf_counter()
+            rows = len(self.flushing) + len(self.flushing_fetches)
+            try:
+                with conn:
+                    conn.executemany(
+                        "INSERT INTO urls "
+                        "(urlhash, url, state, host, discovered_at) "
+                        "VALUES (?, ?, ?, ?, ?) "
+                        "ON CONFLICT(urlhash) DO UPDATE SET "
+                        "state = excluded.state",
+                        self.flushing.values())
+                    # After the inserts, the url may be in the same batch.
+                    conn.executemany(
+                        "UPDATE urls SET content_hash = ?, "
+                        "first_fetched_at = ?, fetched_at = ?, changes = ?, "
+                        "next_visit = ? WHERE urlhash = ?",
+                        (state + (urlhash,) for urlhash, state
+                         in self.flushing_fetches.items()))
+            except sqlite3.Error as e:
+                self.logger.error(f"Failed to commit {rows} urls: {e}")
+            # One observation per group commit, not per url.
+            metrics.observe("persist", time.perf_counter() - start)
+            metrics.inc("crawler_persisted_rows_total", rows)
+            with self.cond:
+                self.flushing = dict()
+                self.flushing_fetches = dict()
+                self.cond.notify_all()
+        conn.close()
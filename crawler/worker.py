@@ -2,17 +2,22 @@ from threading import Thread
 
 from inspect import getsource
 from utils.download import download
-from utils import get_logger
+from utils import get_logger, metrics, PER_PAGE
+from crawler.scheduler import get_host
+from crawler.rate_control import FetchGate
 import scraper
-import time
 
 
 class Worker(Thread):
-    def __init__(self, worker_id, config, frontier, politness_delay):
+    def __init__(self, worker_id, config, frontier, parse_pool=None,
+                 gate=None, pool_controller=None):
         self.logger = get_logger(f"Worker-{worker_id}", "Worker")
         self.config = config
         self.frontier = frontier
-        self.politness_delay = politness_delay
+        self.parse_pool = parse_pool
+        # Bounds how many workers download at once, see crawler/rate_control.
+        self.gate = gate or FetchGate(config.threads_count)
+        self.pool_controller = pool_controller
         # basic check for requests in scraper
         assert {getsource(scraper).find(req) for req in {"from requests import", "import requests"}} == {-1}, "Do not use requests in scraper.py"
         assert {getsource(scraper).find(req) for req in {"from urllib.request import", "import urllib.request"}} == {-1}, "Do not use urllib.request in scraper.py"
@@ -20,21 +25,65 @@ class Worker(Thread):
         
     def run(self):
         while True:
+            # Blocks while other workers may still add urls, and returns None
+            # only once nothing is queued or in flight.
             tbd_url = self.frontier.get_tbd_url()
             if not tbd_url:
-                time.sleep(2) # Wait for other threads
-                tbd_url = self.frontier.get_tbd_url()
-                if not tbd_url:
-                    self.logger.info("Frontier is empty. Stopping Crawler.")
-                    break
-            self.politness_delay.wait(tbd_url)
+                self.logger.info("Frontier is empty. Stopping Crawler.")
+                break
+            fetch_state = None
+            try:
+                fetch_state = self.process(tbd_url)
+            except Exception as e:
+                # The url is still marked complete below, otherwise the crawl
+                # would wait for it forever, but its content hash is not
+                # saved so the next crawl parses it again.
+                self.logger.error(f"Failed to process {tbd_url}: {e!r}")
+            self.frontier.mark_url_complete(tbd_url, fetch_state)
 
+    def process(self, tbd_url):
+        if not still_valid(tbd_url, self.logger):
+            return None
+        with self.gate:
             resp = download(tbd_url, self.config, self.logger)
-            self.logger.info(
-                f"Downloaded {tbd_url}, status <{resp.status}>, "
-                f"using cache {self.config.cache_server}.")
-            scraped_urls = scraper.scraper(tbd_url, resp)
-            for scraped_url in scraped_urls:
-                self.frontier.add_url(scraped_url)
-            self.frontier.mark_url_complete(tbd_url)
-            time.sleep(self.config.time_delay)
+        if self.pool_controller:
+            self.pool_controller.observe(resp.latency)
+        return process_response(
+            tbd_url, resp, self.config, self.frontier, self.logger,
+            self.parse_pool)
+
+
+def still_valid(url, logger):
+    # A queued url stops being valid when its template is found to be a trap.
+    if scraper.is_valid(url):
+        return True
+    logger.info(f"Skipped {url}, it is no longer valid.", extra=PER_PAGE)
+    return False
+
+
+def process_response(url, resp, config, frontier, logger, parse_pool=None):
+    ''' Everything done with a downloaded page, by a Worker or the asyncio
+    engine: counts it, scrapes it unless it is unchanged since the last
+    crawl and adds the urls it links to. Returns the fetch state the caller
+    marks the url complete with. '''
+    frontier.record_fetch(url, resp.status, resp.latency)
+    metrics.observe("download", resp.latency)
+    metrics.inc("crawler_pages_total", host=get_host(url))
+    metrics.inc("crawler_responses_total", status=resp.status)
+    logger.info(
+        f"Downloaded {url}, status <{resp.status}>, "
+        f"using cache {config.cache_server}.", extra=PER_PAGE)
+    changed, fetch_state = frontier.record_content(
+        url, resp.status, resp.content_view if resp.status == 200 else None)
+    if not changed:
+        # Same as the last time it was crawled, so are its links.
+        metrics.inc("crawler_unchanged_pages_total")
+        resp.release()
+        return fetch_state
+    with metrics.timer("scrape"):
+        scraped_urls = scraper.scraper(url, resp, parse_pool)
+    resp.release()
+    with metrics.timer("frontier_add"):
+        for scraped_url in scraped_urls:
+            frontier.add_url(scraped_url)
+    return fetch_state
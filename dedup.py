@@ -0,0 +1,93 @@
+import threading
+from hashlib import blake2b
+from functools import lru_cache
+
+FINGERPRINT_BITS = 64
+# simhash adds up the votes of all words at once in one big integer, with a
+# lane of LANE_BITS bits per fingerprint bit. A lane holds the number of
+# words with that bit set, which is below 2 ** 32 for any page.
+LANE_BITS = 32
+LANE_MASK = (1 << LANE_BITS) - 1
+# The lanes of the 8 bits of every byte value.
+BYTE_LANES = [
+    sum(1 << LANE_BITS * bit for bit in range(8) if value >> bit & 1)
+    for value in range(256)]
+
+"""
+This exactHash function hashes the token sequence of a page, so only pages
+with exactly the same words in the same order collide. O(n) in the tokens.
+"""
+def exact_hash(tokens: list[str]) -> bytes:
+    return blake2b(" ".join(tokens).encode("ascii"), digest_size=16).digest()
+
+@lru_cache(maxsize=1 << 14)
+def _word_lanes(word: str) -> int:
+    # The 64-bit hash of the word spread out with a 1 in the lane of each
+    # set bit, cached as the same words come back on page after page.
+    lanes = 0
+    digest = blake2b(word.encode("ascii"), digest_size=8).digest()
+    for index, value in enumerate(digest):
+        lanes |= BYTE_LANES[value] << 8 * LANE_BITS * index
+    return lanes
+
+"""
+This simhash function builds a 64-bit SimHash from the word frequencies of
+a page. Every word votes on each bit with its count, so pages that share
+most of their words end up a few bits apart. The votes for set bits are
+summed for all 64 bits at once, count * lanes of the word, and a bit is set
+when more than half of the words voted for it. O(d) big integer additions
+for d distinct words, plus 64 steps per page.
+"""
+def simhash(frequencies: dict[str: int]) -> int:
+    votes = 0
+    total = 0
+    for word, count in frequencies.items():
+        votes += count * _word_lanes(word)
+        total += count
+    fingerprint = 0
+    for bit in range(FINGERPRINT_BITS):
+        if 2 * (votes >> LANE_BITS * bit & LANE_MASK) > total:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+class DuplicateIndex(object):
+    ''' Finds exact and near duplicate pages. Fingerprints are split into
+    max_distance + 1 bands; two fingerprints at most max_distance bits apart
+    share at least one band exactly, so only pages in a matching band bucket
+    have to be compared. Has its own lock so lookups do not need the
+    scraper's data lock. '''
+    def __init__(self, max_distance=3):
+        self.max_distance = max_distance
+        num_bands = max_distance + 1
+        self.band_shifts = [
+            FINGERPRINT_BITS * i // num_bands for i in range(num_bands)]
+        self.band_masks = [
+            (1 << (FINGERPRINT_BITS * (i + 1) // num_bands - shift)) - 1
+            for i, shift in enumerate(self.band_shifts)]
+        self.bands = [dict() for _ in range(num_bands)]
+        self.exact_hashes = set()
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+        self.lock = threading.Lock()
+
+    def _band_keys(self, fingerprint):
+        return [fingerprint >> shift & mask
+                for shift, mask in zip(self.band_shifts, self.band_masks)]
+
+    def check_and_add(self, page_hash: bytes, fingerprint: int):
+        # Returns "exact" or "near" for duplicates, None for new pages.
+        band_keys = self._band_keys(fingerprint)
+        with self.lock:
+            if page_hash in self.exact_hashes:
+                self.exact_duplicates += 1
+                return "exact"
+            for band, key in zip(self.bands, band_keys):
+                for other in band.get(key, ()):
+                    if bin(fingerprint ^ other).count("1") <= self.max_distance:
+                        self.near_duplicates += 1
+                        return "near"
+            self.exact_hashes.add(page_hash)
+            for band, key in zip(self.bands, band_keys):
+                band.setdefault(key, []).append(fingerprint)
+        return None
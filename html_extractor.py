@@ -0,0 +1,62 @@
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urldefrag
+
+# Text inside these tags is not page content (BeautifulSoup skips it too).
+SKIPPED_TAGS = {"script", "style", "template"}
+
+
+class PageExtractor(HTMLParser):
+    ''' Collects the stripped text chunks and the anchor hrefs of a page in a
+    single pass over the HTML, without building a tree. '''
+    def __init__(self, url):
+        super().__init__(convert_charrefs=True)
+        self.base_url = url
+        self.base_seen = False
+        self.text = list()
+        self.hrefs = list()
+        self.skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self.skip_depth += 1
+        elif tag == "a":
+            for name, value in attrs:
+                if name == "href":
+                    self.hrefs.append(value or "")
+                    break
+        elif tag == "base" and not self.base_seen:
+            # Only the first <base href> counts.
+            for name, value in attrs:
+                if name == "href" and value:
+                    self.base_url = urljoin(self.base_url, value)
+                    self.base_seen = True
+                    break
+
+    def handle_startendtag(self, tag, attrs):
+        if tag not in SKIPPED_TAGS:
+            self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS and self.skip_depth:
+            self.skip_depth -= 1
+
+    def handle_data(self, data):
+        if not self.skip_depth:
+            data = data.strip()
+            if data:
+                self.text.append(data)
+
+
+def defragment(url: str) -> str:
+    return urldefrag(url).url
+
+
+def extract(content: bytes, url: str):
+    # Returns (text chunks, links) with every link absolute and defragmented.
+    extractor = PageExtractor(url)
+    # str() accepts bytes or a memoryview over them alike.
+    extractor.feed(str(content, "utf-8", errors="replace"))
+    extractor.close()
+    links = {defragment(urljoin(extractor.base_url, href))
+             for href in extractor.hrefs}
+    return extractor.text, list(links)
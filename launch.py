@@ -3,23 +3,46 @@ from argparse import ArgumentParser
 
 from utils.server_registration import get_cache_server
 from utils.config import Config
-from utils.politness_delay import PolitnessDelay
 from crawler import Crawler
 
 
-def main(config_file, restart):
+def main(config_file, restart, engine, partition, recrawl=False):
     cparser = ConfigParser()
     cparser.read(config_file)
     config = Config(cparser)
+    assert not (restart and recrawl), "--recrawl needs the save file"
+    assert config.storage == "sqlite" or not recrawl, (
+        "--recrawl needs the sqlite storage backend")
+    config.recrawl = recrawl
     config.cache_server = get_cache_server(config, restart)
-    politness_delay = PolitnessDelay(config.time_delay)
-    crawler = Crawler(config, restart)
+    if config.partitions > 1:
+        from crawler.distributed import run_local, run_partition
+        assert engine == "threads", "Distributed crawls use the threads engine"
+        if partition is None:
+            run_local(config, restart)
+        else:
+            run_partition(config, partition, restart)
+        return
+    if engine == "asyncio":
+        from crawler.async_engine import AsyncCrawler
+        crawler = AsyncCrawler(config, restart)
+    else:
+        crawler = Crawler(config, restart)
     crawler.start()
 
 
 if __name__ == "__main__":
     parser = ArgumentParser()
     parser.add_argument("--restart", action="store_true", default=False)
+    parser.add_argument(
+        "--recrawl", action="store_true", default=False,
+        help="Also visit the crawled urls that are due again.")
     parser.add_argument("--config_file", type=str, default="config.ini")
+    parser.add_argument(
+        "--engine", choices=["threads", "asyncio"], default="threads")
+    parser.add_argument(
+        "--partition", type=int, default=None,
+        help="Run only this partition of a distributed crawl.")
     args = parser.parse_args()
-    main(args.config_file, args.restart)
+    main(args.config_file, args.restart, args.engine, args.partition,
+         args.recrawl)
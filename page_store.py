@@ -0,0 +1,151 @@
+import os
+import re
+import mmap
+import zlib
+import struct
+import threading
+
+# url length, status, compressed content length, SimHash of the page.
+RECORD_HEADER = struct.Struct("<IHIQ")
+# Segment number, offset of the record in the segment, record length.
+INDEX_ENTRY = struct.Struct("<IQI")
+INDEX_FILE = "index.dat"
+SEGMENT_FILE = re.compile(r"segment-\d{5,}\.dat")
+
+
+def segment_path(directory, segment):
+    return os.path.join(directory, f"segment-{segment:05d}.dat")
+
+
+def remove_page_store(directory):
+    # Only the files of the store, the directory may hold anything else.
+    if not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        if name == INDEX_FILE or SEGMENT_FILE.fullmatch(name):
+            os.remove(os.path.join(directory, name))
+
+
+def _valid_entries(directory, index):
+    # Number of index entries whose record is completely on disk. A crash
+    # can lose the tail of a segment before the tail of the index, and only
+    # the newest entries can be affected.
+    count = len(index) // INDEX_ENTRY.size
+    sizes = dict()
+    while count:
+        segment, offset, length = INDEX_ENTRY.unpack_from(
+            index, (count - 1) * INDEX_ENTRY.size)
+        if segment not in sizes:
+            path = segment_path(directory, segment)
+            sizes[segment] = os.path.getsize(path) if os.path.exists(path) else 0
+        if offset + length <= sizes[segment]:
+            break
+        count -= 1
+    return count
+
+
+class PageStore(object):
+    ''' Appends every parsed page to segment files of at most segment_bytes:
+    its url, status, SimHash and zlib compressed html. The index file holds
+    where each record starts, in crawl order, so the pages can be analyzed
+    again without fetching them (see reanalyze.py). Both files are written
+    through buffers, a crash loses at most the pages still in them. '''
+    def __init__(self, directory, restart=False, segment_bytes=256 * 1024 * 1024,
+                 compression_level=6, buffer_size=1024 * 1024):
+        if restart:
+            remove_page_store(directory)
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.compression_level = compression_level
+        self.buffer_size = buffer_size
+        self.lock = threading.Lock()
+
+        index_path = os.path.join(directory, INDEX_FILE)
+        index = b""
+        if os.path.exists(index_path):
+            with open(index_path, "rb") as f:
+                index = f.read()
+        self.pages = _valid_entries(directory, index)
+        self.segment, self.offset = 0, 0
+        if self.pages:
+            self.segment, offset, length = INDEX_ENTRY.unpack_from(
+                index, (self.pages - 1) * INDEX_ENTRY.size)
+            self.offset = offset + length
+        with open(index_path, "ab") as f:
+            f.truncate(self.pages * INDEX_ENTRY.size)
+        self.index = open(index_path, "ab", buffering=buffer_size)
+        self.file = self._open_segment()
+
+    def _open_segment(self):
+        f = open(segment_path(self.directory, self.segment), "ab",
+                 buffering=self.buffer_size)
+        # Drops whatever was written after the last complete record.
+        f.truncate(self.offset)
+        return f
+
+    def append(self, url, status, fingerprint, content):
+        # Compressed before taking the lock, zlib releases the GIL.
+        data = zlib.compress(content, self.compression_level)
+        url = url.encode("utf-8")
+        record = b"".join((
+            RECORD_HEADER.pack(len(url), status, len(data), fingerprint),
+            url, data))
+        with self.lock:
+            if self.offset and self.offset + len(record) > self.segment_bytes:
+                self.file.close()
+                self.segment += 1
+                self.offset = 0
+                self.file = self._open_segment()
+            self.file.write(record)
+            self.index.write(
+                INDEX_ENTRY.pack(self.segment, self.offset, len(record)))
+            self.offset += len(record)
+            self.pages += 1
+
+    def close(self):
+        with self.lock:
+            # The segment first, so the index never points past its end.
+            self.file.close()
+            self.index.close()
+
+
+class PageStoreReader(object):
+    ''' Random access to the pages of a PageStore. The index and segments are
+    memory mapped, so readers in several processes share the page cache and
+    nothing is read until it is used. '''
+    def __init__(self, directory):
+        self.directory = directory
+        self.maps = dict()
+        self.index = self._map(os.path.join(directory, INDEX_FILE))
+        self.pages = _valid_entries(directory, self.index or b"")
+
+    def __len__(self):
+        return self.pages
+
+    def _map(self, path):
+        if not os.path.getsize(path):
+            return None
+        with open(path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def read(self, page):
+        ''' Returns (url, status, fingerprint, html) of the page'th page. '''
+        segment, offset, _ = INDEX_ENTRY.unpack_from(
+            self.index, page * INDEX_ENTRY.size)
+        data = self.maps.get(segment)
+        if data is None:
+            data = self.maps[segment] = self._map(
+                segment_path(self.directory, segment))
+        url_length, status, length, fingerprint = RECORD_HEADER.unpack_from(
+            data, offset)
+        start = offset + RECORD_HEADER.size
+        url = data[start:start + url_length].decode("utf-8")
+        start += url_length
+        return url, status, fingerprint, zlib.decompress(data[start:start + length])
+
+    def close(self):
+        for data in self.maps.values():
+            data.close()
+        if self.index is not None:
+            self.index.close()
@@ -0,0 +1,110 @@
+''' Rebuilds the report from the pages saved by the page store ([PAGE_STORE]
+in config.ini) with the current extractor, tokenizer and duplicate
+detection, without fetching anything from the cache server.
+
+    python reanalyze.py
+    python reanalyze.py --processes 8 pages.part0 pages.part1
+
+Pages are parsed in parallel by worker processes that memory map the store,
+and merged in crawl order, so duplicates are decided as during the crawl.
+'''
+import os
+import time
+import multiprocessing
+from collections import deque
+from argparse import ArgumentParser
+from configparser import ConfigParser
+from concurrent.futures import ProcessPoolExecutor
+
+from utils import get_logger
+from utils.config import Config
+from page_store import PageStoreReader
+from analytics import CrawlStats, write_atomically
+from dedup import DuplicateIndex
+import scraper
+
+# Pages parsed per task.
+CHUNK_PAGES = 256
+
+# Readers of the worker process, kept open between chunks.
+_readers = dict()
+
+
+def analyze_chunk(directory, start, stop, extractor):
+    # Parses pages start to stop of the store in a worker process and returns
+    # (url, word count, word frequencies, exact hash, simhash) for each.
+    reader = _readers.get(directory)
+    if reader is None:
+        reader = _readers[directory] = PageStoreReader(directory)
+    pages = list()
+    for page in range(start, stop):
+        url, _, _, content = reader.read(page)
+        _, length, frequencies, page_hash, fingerprint, _ = scraper.parse_page(
+            content, url, extractor)
+        pages.append((url, length, frequencies, page_hash, fingerprint))
+    return pages
+
+
+def reanalyze(directories, config, processes):
+    ''' Returns the report for the pages of every store in directories. '''
+    duplicates = DuplicateIndex(config.near_duplicate_distance)
+    stats = CrawlStats()
+    unique_count = 0
+    chunks = list()
+    for directory in directories:
+        reader = PageStoreReader(directory)
+        pages = len(reader)
+        reader.close()
+        chunks.extend(
+            (directory, start, min(start + CHUNK_PAGES, pages), config.extractor)
+            for start in range(0, pages, CHUNK_PAGES))
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(processes, mp_context=context) as pool:
+        # A few chunks per process in flight, so parsed pages do not pile up
+        # faster than they are merged.
+        pending = deque()
+        chunks = iter(chunks)
+        while True:
+            while len(pending) < 4 * processes:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                pending.append(pool.submit(analyze_chunk, *chunk))
+            if not pending:
+                break
+            for url, length, frequencies, page_hash, fingerprint in (
+                    pending.popleft().result()):
+                if duplicates.check_and_add(page_hash, fingerprint):
+                    continue
+                stats.record_page(url, length, frequencies)
+                unique_count += 1
+    return scraper.format_report(
+        unique_count, duplicates.exact_duplicates, duplicates.near_duplicates,
+        stats.longest_page(), stats.top_words(scraper.COMMON_WORDS_COUNT),
+        stats.subdomain_counts())
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("directories", nargs="*",
+                        help="Page stores to read, [PAGE_STORE] DIRECTORY by default.")
+    parser.add_argument("--config_file", type=str, default="config.ini")
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--report_file", help="[REPORT] FILE by default.")
+    args = parser.parse_args()
+
+    cparser = ConfigParser()
+    cparser.read(args.config_file)
+    config = Config(cparser)
+    logger = get_logger("REANALYZE")
+    directories = args.directories or [config.page_store_dir]
+    assert all(directories), "Set [PAGE_STORE] DIRECTORY or pass the page stores"
+    report_file = args.report_file or config.report_file
+    start = time.perf_counter()
+    write_atomically(report_file, reanalyze(directories, config, args.processes))
+    logger.info(f"Wrote {report_file} in {time.perf_counter() - start:.2f} s.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,68 @@
 import re
+import json
+import time
 import threading
-from urllib.parse import urlparse, urljoin, urlunparse
+from urllib.parse import urljoin
 from bs4 import BeautifulSoup
+from html_extractor import extract, defragment
 from tokenizer import tokenize, compute_word_frequencies
-from scrapper_helper import store_url
+from dedup import DuplicateIndex, exact_hash, simhash
+from analytics import CrawlStats, ReportWriter, write_atomically
+from url_filter import UrlFilter
+from trap_detector import TrapDetector
+from page_store import PageStore
+from utils import get_logger, metrics, PER_PAGE
+from utils.download import BACKOFF_STATUSES, TOO_LARGE_STATUS
 
 COMMON_WORDS_COUNT = 50
 MAX_PAGE_SIZE = 2000000
 
-blackList_host = {"swiki.ics.uci.edu", "calendar.ics.uci.edu", "ngs.ics.uci.edu", "grape.ics.uci.edu", "isg.ics.uci.edu", 
-                  "intranet.ics.uci.edu", "wics.ics.uci.edu", "wiki.ics.uci.edu", "www.cs.jhu.edu", "cs.jhu.edu", "www.physics.uci.edu",
-                  "doi.org", "dx.doi.org", "arxiv.org", "ieeexplore.ieee.org", "www.cs.cmu.edu", "cs.cmu.edu", "www.cecs.uci.edu"}
-blacklist_path = {"/~eppstein/pix/", "/events/"}
-blacklist_url = set()
-unique_urls = dict() # dictionary of keys: url and value: visit_counter
-longest_page = {"url": "", "length": -1}
-common_words = dict()
-check_sums = []
-subdomain_page_count = dict()
+url_filter = UrlFilter()
+traps = TrapDetector()
+unique_count = 0
+stats = CrawlStats()
+duplicates = DuplicateIndex()
 report_file = "report.txt"
-
-data_lock = threading.Lock()
-
-def scraper(url, resp):
-    links = extract_next_links(url, resp)
+report_writer = None
+page_store = None
+extractor = "stream"
+
+data_lock = metrics.TimedLock(threading.Lock(), "scraper")
+logger = get_logger("SCRAPER")
+
+def configure(config, restart=False):
+    # Applies the settings from config.ini and starts writing the report.
+    # Called once before crawling.
+    global url_filter, traps, duplicates, report_file, report_writer, extractor
+    global page_store
+    url_filter = UrlFilter.from_config(config)
+    traps = TrapDetector.from_config(config)
+    duplicates = DuplicateIndex(config.near_duplicate_distance)
+    extractor = config.extractor
+    report_file = config.report_file
+    report_writer = ReportWriter(
+        update_report, config.report_interval, config.report_every_pages)
+    report_writer.start()
+    if config.page_store_dir:
+        page_store = PageStore(
+            config.page_store_dir, restart, config.page_store_segment_bytes,
+            config.page_store_compression_level)
+
+def finish():
+    # Stops the report writer and writes the final report.
+    if report_writer is not None:
+        report_writer.stop()
+    if page_store is not None:
+        page_store.close()
+
+def scraper(url, resp, parse_pool=None):
+    # Links are validated here, once, so that is_valid sees the blocked trap
+    # templates of this process even when the page was parsed in another one.
+    links = extract_next_links(url, resp, parse_pool)
     return [link for link in links if is_valid(link)]
 
 
-def extract_next_links(url: str, resp):
+def extract_next_links(url: str, resp, parse_pool=None):
     # Implementation required.
     # url: the URL that was used to get the page
     # resp.url: the actual url of the page
@@ -38,122 +73,140 @@ def extract_next_links(url: str, resp):
     #         resp.raw_response.content: the content of the page!
     # Return a list with the hyperlinks (as strings) scrapped from resp.raw_response.content
     if not (can_extract(resp)):
+        # Only answers of the site itself say something about the template,
+        # not fetches that failed on the way.
+        if resp.status not in BACKOFF_STATUSES and resp.status != TOO_LARGE_STATUS:
+            record_template(url, None)
         return list()
 
-    soup = BeautifulSoup(resp.raw_response.content, "html.parser")
-
-    file_sum = 0
-    tokenized_text = []
-    for currentText in soup.stripped_strings:
-        # Gets the current text from a generator that contains the content of the webpage
-        token_values = tokenize(currentText)
-        tokenized_text.extend(token_values[0])
-        file_sum += token_values[1]
-        
-
-    links = get_links(soup, resp.url)
+    if parse_pool is None:
+        parsed_page = parse_page(resp.raw_response.content, resp.url, extractor)
+    else:
+        # Parsing is CPU bound, so it runs in another process to avoid the GIL.
+        parsed_page = parse_pool.submit(
+            parse_page, resp.raw_response.content, resp.url, extractor).result()
+    if page_store is not None:
+        # Duplicates too, so reanalyze.py can decide them again.
+        with metrics.timer("store"):
+            page_store.append(resp.url, resp.status, parsed_page[4],
+                              resp.raw_response.content)
+    return record_page(url, resp.url, parsed_page)
+
+
+def parse_page(content, url: str, extractor="stream"):
+    # Parses the page and returns (links, word count, word frequencies,
+    # exact hash, simhash, stage timings). Does not touch any shared state so
+    # it can run in a worker process. The links are not validated yet.
+    start = time.perf_counter()
+    if extractor == "soup":
+        soup = BeautifulSoup(content, "html.parser")
+        text = soup.stripped_strings
+        links = get_links(soup, url)
+    else:
+        # Text and links in one pass, without building a tree.
+        text, links = extract(content, url)
+
+    parsed = time.perf_counter()
+
+    # Tokenizes the whole text of the webpage at once
+    tokenized_text = tokenize(" ".join(text))
+
+    frequencies = compute_word_frequencies(tokenized_text, dict())
+    tokenized = time.perf_counter()
+    page_hash, fingerprint = exact_hash(tokenized_text), simhash(frequencies)
+    # Timed here and recorded by the caller, as this may be another process.
+    timings = {"parse": parsed - start, "tokenize": tokenized - parsed,
+               "fingerprint": time.perf_counter() - tokenized}
+    return (links, len(tokenized_text), frequencies,
+            page_hash, fingerprint, timings)
+
+
+def record_page(url: str, resp_url: str, parsed_page):
+    # Merges a parsed page into the crawl statistics and returns its links.
+    global unique_count
+    links, page_length, frequencies, page_hash, fingerprint, timings = parsed_page
+    for stage, seconds in timings.items():
+        metrics.observe(stage, seconds)
+    with metrics.timer("dedup"):
+        duplicate = duplicates.check_and_add(page_hash, fingerprint)
+    record_template(url, None if duplicate else fingerprint)
+    if duplicate:
+        logger.info(f"{url} is a duplicate ({duplicate}) of a pre-existing URL.",
+                    extra=PER_PAGE)
+        return list()
 
+    stats.record_page(resp_url, page_length, frequencies)
     with data_lock:
-        if file_sum in check_sums:
-            print("This is a duplicate of a pre-existing URL.")
-            return list()
-        else:
-            check_sums.append(file_sum)
-
-        check_page_length(len(tokenized_text), resp.url)
-        compute_word_frequencies(tokenized_text, common_words)
-        store_url(url, blacklist_url, unique_urls)
-        increment_subdomain_count(resp.url, subdomain_page_count)
-        
-        sorted_frequencies = sorted(common_words.items(), key = lambda x: x[1], reverse = True)
-        update_report(unique_urls, longest_page, sorted_frequencies, subdomain_page_count)
+        unique_count += 1
+    if report_writer is not None:
+        report_writer.page_recorded()
     return links
 
 
+def record_template(url: str, fingerprint):
+    # Counts the page towards its url template, fingerprint is None for pages
+    # without new content. Logs the template if it is now blocked as a trap.
+    template = traps.record(url, fingerprint)
+    if template is not None:
+        metrics.inc("crawler_trap_templates_total")
+        logger.warning(f"Not crawling {template} any further, it looks like a trap.")
+
+
 def get_links(soup: BeautifulSoup, url: str):
     # Retrieves the links on the web page.
     found_links = set()
     extracted_links = soup.find_all("a", href=True)
 
     for tag in extracted_links:
-        # Convert to full url
+        # Convert to full url and defragment it
         href = tag.get("href")
-        full_url = urljoin(url, href)
+        found_links.add(defragment(urljoin(url, href)))
 
-        # Defragment url
-        parsed = urlparse(full_url)
-        defragmented_url = urlunparse(parsed._replace(fragment=""))
-
-        # checks if defragmented URL is valid
-        if is_valid(defragmented_url):
-            found_links.add(defragmented_url)
-        
     return list(found_links)
 
 
-def check_page_length(length: int, url: str):
-    # Checks and updates longest page
-    if length > longest_page["length"]:
-        longest_page["url"] = url
-        longest_page["length"] = length
-
-
-def increment_subdomain_count(current_url: str,
-                              current_subdomains: dict[str: int]) -> dict[str: int]:
-    parsed = urlparse(current_url)
-    subdomain = parsed.netloc.lower()
-
-    if subdomain in current_subdomains.keys():
-        current_subdomains[subdomain] += 1
-    else:
-        current_subdomains[subdomain] = 1
-    return current_subdomains
-
-def update_report(unique_urls, longest_page, words, subdomain_counts):
-    with open(report_file, "w", encoding="utf-8") as f:
-        f.write("Crawler Report\n")
-        f.write(f"Total unique URLs: {len(unique_urls)}\n")
-        f.write(f"Longest page: {longest_page['url']} : {longest_page['length']} Words\n")
-        f.write("\nCommon Words:\n")
-        for word, count in words[:COMMON_WORDS_COUNT]:
-            f.write(f"{word} {count}\n")
-        f.write("\nSubdomain Counts:\n")
-        for subdomain, count in subdomain_counts.items():
-            f.write(f"{subdomain}, {count}\n")
+def format_report(unique_count, exact_duplicates, near_duplicates,
+                  longest_page, top_words, subdomain_counts):
+    longest_url, longest_length = longest_page
+    lines = ["Crawler Report",
+             f"Total unique URLs: {unique_count}",
+             f"Exact duplicates skipped: {exact_duplicates}",
+             f"Near duplicates skipped: {near_duplicates}",
+             f"Longest page: {longest_url} : {longest_length} Words",
+             "", "Common Words:"]
+    for word, count in top_words:
+        lines.append(f"{word} {count}")
+    lines.extend(["", "Subdomain Counts:"])
+    for subdomain, count in subdomain_counts.items():
+        lines.append(f"{subdomain}, {count}")
+    return "\n".join(lines) + "\n"
+
+
+def update_report():
+    write_atomically(report_file, format_report(
+        unique_count, duplicates.exact_duplicates,
+        duplicates.near_duplicates, stats.longest_page(),
+        stats.top_words(COMMON_WORDS_COUNT), stats.subdomain_counts()))
+
+
+def write_stats(path):
+    # Everything the report is built from, so the reports of several
+    # partitions of a distributed crawl can be merged into one.
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"unique_urls": unique_count,
+                   "exact_duplicates": duplicates.exact_duplicates,
+                   "near_duplicates": duplicates.near_duplicates,
+                   "longest_page": list(stats.longest_page()),
+                   "words": stats.word_counts(),
+                   "subdomains": stats.subdomain_counts()}, f)
 
 
 def is_valid(url: str):
     # Decide whether to crawl this url or not. 
     # If you decide to crawl it, return True; otherwise return False.
-    # There are already some conditions that return False.
-    try:
-        parsed = urlparse(url)
-        if parsed.scheme not in set(["http", "https"]) or is_crawler_trap(url, parsed):
-            return False
-        return not re.match(
-            r".*\.(css|js|bmp|gif|jpe?g|ico"
-            + r"|png|tiff?|mid|mp2|mp3|mp4"
-            + r"|wav|avi|mov|mpeg|ram|m4v|mkv|ogg|ogv|pdf"
-            + r"|ps|eps|tex|ppt|pptx|doc|docx|xls|xlsx|names"
-            + r"|data|dat|exe|bz2|tar|msi|bin|7z|psd|dmg|iso"
-            + r"|epub|dll|cnf|tgz|sha1"
-            + r"|thmx|mso|arff|rtf|jar|csv"
-            + r"|rm|smil|wmv|swf|wma|zip|rar|gz)$", parsed.path.lower())
-
-    except TypeError:
-        print ("TypeError for ", parsed)
-        raise
-
-
-def is_crawler_trap(url: str, parsed_url) -> bool:
-    for p in blacklist_path:
-        # Checks for blacklisted path values
-        if parsed_url.path.lower().startswith(p):
-            return True
-
-    # Checks for blacklisted urls
-    return (parsed_url.hostname in blackList_host
-            or url in blacklist_url)
+    # The static rules (scheme, hosts, paths, extensions) are in url_filter,
+    # url templates found to be traps while crawling are checked here.
+    return url_filter.is_valid(url) and not traps.is_blocked(url)
 
 
 def is_too_large(resp) -> bool:
@@ -169,17 +222,29 @@ def is_too_large(resp) -> bool:
         return False
 
 
+def is_html(resp) -> bool:
+    content_type = resp.raw_response.headers.get("Content-Type")
+    if content_type is None:
+        return True
+    return "html" in str(content_type).lower()
+
+
 def can_extract(resp) -> bool:
     if resp.status != 200:
-        print(f"Failed to retrieve the webpage: {resp.error}. Status code: {resp.status}")
+        logger.info(f"Failed to retrieve {resp.url}: {resp.error}. Status code: {resp.status}",
+                    extra=PER_PAGE)
         return False
 
     if not resp.raw_response.content:
-        print("No data found, skipping page.")
+        logger.info(f"No data found for {resp.url}, skipping page.", extra=PER_PAGE)
         return False
 
     if is_too_large(resp):
-        print("Page too large, skipping.")
+        logger.info(f"{resp.url} is too large, skipping.", extra=PER_PAGE)
+        return False
+
+    if not is_html(resp):
+        logger.info(f"{resp.url} is not html, skipping.", extra=PER_PAGE)
         return False
     
     return True
\ No newline at end of file
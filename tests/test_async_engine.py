@@ -0,0 +1,71 @@
+import re
+import tempfile
+import threading
+import unittest
+from argparse import Namespace
+
+from crawler.async_engine import AsyncCrawler
+from benchmarks.fake_cache import FakeCacheServer
+from benchmarks.synthetic_site import SiteSpec, SyntheticSite
+from benchmarks.run_crawl import make_config
+
+
+def reachable_pages(site):
+    # Every url reachable from the seeds, by following the links of the site.
+    pages = set()
+    stack = list(site.seed_urls())
+    while stack:
+        url = stack.pop()
+        if url in pages:
+            continue
+        pages.add(url)
+        _, html = site.page(url)
+        stack.extend(re.findall(r'href="([^"]+)"', html or ""))
+    return pages
+
+
+class RecordingSite(SyntheticSite):
+    def __init__(self, spec):
+        super().__init__(spec)
+        self.fetched = list()
+        self.lock = threading.Lock()
+
+    def page(self, url):
+        with self.lock:
+            self.fetched.append(url)
+        return super().page(url)
+
+
+class AsyncEngineTest(unittest.TestCase):
+    ''' Crawls a small synthetic site through the local stand-in cache
+    server with the asyncio engine (launch.py --engine asyncio). '''
+    def setUp(self):
+        self.site = RecordingSite(SiteSpec(
+            hosts=3, pages_per_host=30, fan_out=5, trap_ratio=0.0,
+            duplicate_ratio=0.0, error_ratio=0.0, latency_ms=1.0))
+        self.server = FakeCacheServer(self.site)
+        self.server.start()
+        self.tmp = tempfile.TemporaryDirectory()
+        args = Namespace(threads=4, min_threads=None, parse_processes=0,
+                         storage="sqlite", page_store=None, politeness=0.0)
+        self.config = make_config(
+            self.tmp.name, self.site, self.server.address, args)
+
+    def tearDown(self):
+        self.server.stop()
+        self.tmp.cleanup()
+
+    def test_fetches_every_page_and_ends(self):
+        crawler = AsyncCrawler(self.config, True)
+        thread = threading.Thread(target=crawler.start, daemon=True)
+        thread.start()
+        thread.join(timeout=120)
+        self.assertFalse(thread.is_alive(), "The crawl did not end.")
+        # Every reachable page, each fetched once.
+        self.assertEqual(
+            sorted(self.site.fetched), sorted(reachable_pages(self.site)))
+        self.assertEqual(crawler.frontier.in_flight, set())
+
+
+if __name__ == "__main__":
+    unittest.main()
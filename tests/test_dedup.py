@@ -0,0 +1,44 @@
+import random
+import unittest
+from hashlib import blake2b
+
+from dedup import simhash, exact_hash, DuplicateIndex, FINGERPRINT_BITS
+
+
+def reference_simhash(frequencies):
+    # One vote per bit and word, as simhash was first written.
+    weights = [0] * FINGERPRINT_BITS
+    for word, count in frequencies.items():
+        word_hash = int.from_bytes(
+            blake2b(word.encode("ascii"), digest_size=8).digest(), "little")
+        for bit in range(FINGERPRINT_BITS):
+            weights[bit] += count if word_hash >> bit & 1 else -count
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+
+class SimhashTest(unittest.TestCase):
+    def test_matches_the_per_bit_version(self):
+        rng = random.Random(0)
+        words = [f"word{i}" for i in range(2000)]
+        for _ in range(50):
+            frequencies = {word: rng.randint(1, 50)
+                           for word in rng.sample(words, rng.randint(1, 300))}
+            self.assertEqual(simhash(frequencies),
+                             reference_simhash(frequencies))
+        self.assertEqual(simhash({}), 0)
+
+    def test_near_duplicates(self):
+        rng = random.Random(1)
+        words = [f"word{i}" for i in range(5000)]
+        page = {word: rng.randint(1, 5) for word in rng.sample(words, 400)}
+        changed = dict(page, extra=1)
+        index = DuplicateIndex(3)
+        self.assertIsNone(index.check_and_add(exact_hash(["a"]), simhash(page)))
+        self.assertEqual(
+            index.check_and_add(exact_hash(["b"]), simhash(changed)), "near")
+        self.assertEqual(
+            index.check_and_add(exact_hash(["a"]), simhash(page)), "exact")
+
+
+if __name__ == "__main__":
+    unittest.main()
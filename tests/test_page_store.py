@@ -0,0 +1,77 @@
+import os
+import tempfile
+import unittest
+
+from page_store import (
+    PageStore, PageStoreReader, remove_page_store, segment_path, INDEX_FILE)
+
+
+def page(i):
+    return (f"https://www.ics.uci.edu/page/{i}", 200, i,
+            f"<html><body>page {i}</body></html>".encode() * 20)
+
+
+class PageStoreTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = tmp.name
+
+    def write(self, count, restart=False, segment_bytes=256 * 1024 * 1024):
+        store = PageStore(self.directory, restart, segment_bytes)
+        for i in range(count):
+            store.append(*page(i))
+        store.close()
+
+    def read_all(self):
+        reader = PageStoreReader(self.directory)
+        try:
+            return [reader.read(i) for i in range(len(reader))]
+        finally:
+            reader.close()
+
+    def expected(self, count):
+        return [page(i) for i in range(count)]
+
+    def test_pages_are_read_back_across_segments(self):
+        self.write(50, segment_bytes=1024)
+        self.assertTrue(os.path.exists(segment_path(self.directory, 1)))
+        self.assertEqual(self.read_all(), self.expected(50))
+
+    def test_reopened_store_appends(self):
+        self.write(5)
+        store = PageStore(self.directory)
+        for i in range(5, 8):
+            store.append(*page(i))
+        store.close()
+        self.assertEqual(self.read_all(), self.expected(8))
+
+    def test_torn_tail_is_dropped(self):
+        self.write(5)
+        path = segment_path(self.directory, 0)
+        # The last record only made it to disk halfway.
+        os.truncate(path, os.path.getsize(path) - 10)
+        self.assertEqual(self.read_all(), self.expected(4))
+        store = PageStore(self.directory)
+        store.append(*page(4))
+        store.close()
+        self.assertEqual(self.read_all(), self.expected(5))
+
+    def test_restart_removes_only_the_store(self):
+        other = os.path.join(self.directory, "notes.txt")
+        with open(other, "w") as f:
+            f.write("keep")
+        self.write(50, segment_bytes=1024)
+        remove_page_store(self.directory)
+        self.assertEqual(os.listdir(self.directory), ["notes.txt"])
+        self.write(3, restart=True)
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         [INDEX_FILE, "notes.txt", "segment-00000.dat"])
+        self.assertEqual(self.read_all(), self.expected(3))
+
+    def test_missing_directory_is_not_an_error(self):
+        remove_page_store(os.path.join(self.directory, "missing"))
+
+
+if __name__ == "__main__":
+    unittest.main()
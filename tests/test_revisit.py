@@ -0,0 +1,98 @@
+import time
+import tempfile
+import unittest
+from argparse import Namespace
+
+from crawler.frontier import Frontier
+from crawler.revisit import RevisitPolicy, content_hash
+from benchmarks.run_crawl import make_config
+from benchmarks.synthetic_site import SiteSpec, SyntheticSite
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+
+class RevisitPolicyTest(unittest.TestCase):
+    def setUp(self):
+        self.policy = RevisitPolicy(HOUR, 30 * DAY)
+
+    def test_first_fetch_is_a_change(self):
+        changed, state = self.policy.update(None, b"a", 1000.0)
+        self.assertTrue(changed)
+        self.assertEqual(state, (b"a", 1000.0, 1000.0, 0, 1000.0 + 2 * HOUR))
+
+    def test_unchanged_page_is_visited_half_as_often(self):
+        changed, state = self.policy.update((b"a", 0.0, 0), b"a", 4 * DAY)
+        self.assertFalse(changed)
+        self.assertEqual(state, (b"a", 0.0, 4 * DAY, 0, 12 * DAY))
+
+    def test_changing_page_settles_at_its_rate(self):
+        changed, state = self.policy.update((b"a", 0.0, 9), b"b", 10 * DAY)
+        self.assertTrue(changed)
+        self.assertEqual(state[3], 10)
+        self.assertAlmostEqual(state[4] - 10 * DAY, 10 * DAY / 10.5)
+
+    def test_interval_is_clamped(self):
+        _, state = self.policy.update((b"a", 0.0, 1000), b"b", DAY)
+        self.assertEqual(state[4], DAY + HOUR)
+        _, state = self.policy.update((b"a", 0.0, 0), b"a", 365 * DAY)
+        self.assertEqual(state[4], 395 * DAY)
+
+    def test_content_hash_includes_the_status(self):
+        self.assertNotEqual(content_hash(200, b""), content_hash(404, b""))
+        self.assertEqual(content_hash(404, None), content_hash(404, b""))
+        self.assertEqual(content_hash(200, memoryview(b"page")),
+                         content_hash(200, b"page"))
+
+
+class RecordContentTest(unittest.TestCase):
+    ''' The content hash is only saved once the page was handled, so pages
+    that failed or were cut short by a crash are parsed again. '''
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        site = SyntheticSite(SiteSpec(hosts=1, pages_per_host=5))
+        args = Namespace(threads=1, min_threads=None, parse_processes=0,
+                         storage="sqlite", page_store=None, politeness=0.0)
+        self.config = make_config(tmp.name, site, ("127.0.0.1", 1), args)
+        self.url = site.seed_urls()[0]
+        self.frontiers = list()
+
+    def tearDown(self):
+        for frontier in self.frontiers:
+            frontier.save.close()
+
+    def open(self, restart=False):
+        frontier = Frontier(self.config, restart)
+        self.frontiers.append(frontier)
+        while frontier.loading:
+            time.sleep(0.01)
+        return frontier
+
+    def test_hash_is_not_saved_before_the_url_is_complete(self):
+        frontier = self.open(restart=True)
+        changed, _ = frontier.record_content(self.url, 200, b"page")
+        self.assertTrue(changed)
+        # Crash before mark_url_complete.
+        frontier.save.flush()
+        frontier = self.open()
+        changed, _ = frontier.record_content(self.url, 200, b"page")
+        self.assertTrue(changed)
+
+    def test_failed_page_is_parsed_again(self):
+        frontier = self.open(restart=True)
+        frontier.record_content(self.url, 200, b"page")
+        frontier.mark_url_complete(self.url, None)
+        frontier.save.flush()
+        frontier = self.open()
+        changed, state = frontier.record_content(self.url, 200, b"page")
+        self.assertTrue(changed)
+        frontier.mark_url_complete(self.url, state)
+        frontier.save.flush()
+        frontier = self.open()
+        changed, _ = frontier.record_content(self.url, 200, b"page")
+        self.assertFalse(changed)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+
+from crawler.scheduler import (
+    HostScheduler, MIN_BACKOFF_DELAY, SLOW_FETCHES)
+
+
+class PolitenessTest(unittest.TestCase):
+    def test_hosts_wait_their_delay_and_others_go_meanwhile(self):
+        scheduler = HostScheduler(1.0)
+        for url in ("http://a.ics.uci.edu/1", "http://a.ics.uci.edu/2",
+                    "http://b.ics.uci.edu/1"):
+            scheduler.add(url)
+        self.assertEqual(len(scheduler), 3)
+        first, _ = scheduler.pop(now=10.0)
+        second, _ = scheduler.pop(now=10.0)
+        self.assertEqual({first, second},
+                         {"http://a.ics.uci.edu/1", "http://b.ics.uci.edu/1"})
+        self.assertEqual(scheduler.ready_hosts(now=10.5), 0)
+        url, wait = scheduler.pop(now=10.5)
+        self.assertIsNone(url)
+        self.assertAlmostEqual(wait, 0.5)
+        self.assertEqual(scheduler.ready_hosts(now=11.0), 1)
+        self.assertEqual(scheduler.pop(now=11.0),
+                         ("http://a.ics.uci.edu/2", None))
+        self.assertEqual(scheduler.pop(now=11.0), (None, None))
+        self.assertEqual(len(scheduler), 0)
+
+    def test_idle_host_keeps_its_delay(self):
+        scheduler = HostScheduler(1.0)
+        scheduler.add("http://a.ics.uci.edu/1")
+        scheduler.pop(now=10.0)
+        scheduler.add("http://a.ics.uci.edu/2")
+        url, wait = scheduler.pop(now=10.2)
+        self.assertIsNone(url)
+        self.assertAlmostEqual(wait, 0.8)
+
+
+class BackoffTest(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = HostScheduler(0.0, max_delay=60, backoff=2.0,
+                                       latency_backoff=2.0)
+        self.host = "a.ics.uci.edu"
+
+    def record(self, status, latency, times=1):
+        for _ in range(times):
+            self.scheduler.record(self.host, status, latency, now=100.0)
+
+    def test_errors_back_off_and_healthy_fetches_snap_back(self):
+        self.record(503, 0.1)
+        self.assertEqual(self.scheduler.delays[self.host],
+                         MIN_BACKOFF_DELAY * 2)
+        self.record(503, 0.1)
+        self.assertEqual(self.scheduler.delays[self.host],
+                         MIN_BACKOFF_DELAY * 4)
+        self.assertEqual(self.scheduler.next_allowed[self.host],
+                         100.0 + MIN_BACKOFF_DELAY * 4)
+        # Halved by healthy fetches, then back to POLITENESS.
+        self.record(200, 0.1, 2)
+        self.assertEqual(self.scheduler.delays[self.host], MIN_BACKOFF_DELAY)
+        self.record(200, 0.1)
+        self.assertNotIn(self.host, self.scheduler.delays)
+
+    def test_max_delay(self):
+        self.record(0, None, 20)
+        self.assertEqual(self.scheduler.delays[self.host], 60)
+
+    def test_latency_outlier_does_not_back_off(self):
+        self.record(200, 0.1, 5)
+        self.record(200, 1.0)
+        self.record(200, 0.1)
+        self.record(200, 1.0)
+        self.assertNotIn(self.host, self.scheduler.delays)
+
+    def test_sustained_slowdown_backs_off_without_error_floor(self):
+        self.record(200, 0.01, 5)
+        for latency in (0.05, 0.1, 0.2)[:SLOW_FETCHES]:
+            self.record(200, latency)
+        delay = self.scheduler.delays[self.host]
+        self.assertGreater(delay, 0)
+        self.assertLess(delay, MIN_BACKOFF_DELAY)
+        # One healthy fetch brings it back to POLITENESS.
+        self.record(200, 0.01)
+        self.assertNotIn(self.host, self.scheduler.delays)
+
+    def test_backed_off_host_is_delayed(self):
+        self.scheduler.add(f"http://{self.host}/1")
+        self.scheduler.add(f"http://{self.host}/2")
+        self.assertEqual(
+            self.scheduler.pop(now=100.0), (f"http://{self.host}/1", None))
+        self.record(429, 0.1)
+        url, wait = self.scheduler.pop(now=100.0)
+        self.assertIsNone(url)
+        self.assertAlmostEqual(wait, MIN_BACKOFF_DELAY * 2)
+        self.assertEqual(self.scheduler.pop(now=101.0),
+                         (f"http://{self.host}/2", None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+
+from utils import get_urlhash_digest
+from crawler.seen_set import SeenSet, FingerprintTable, COLLIDED
+
+
+class SeenSetTest(unittest.TestCase):
+    def test_lookup_settles_bloom_hits_in_memory(self):
+        seen = SeenSet(1000, 0.01)
+        saved = [get_urlhash_digest(f"http://a.ics.uci.edu/{i}")
+                 for i in range(1000)]
+        for digest in saved:
+            seen.add(digest)
+        self.assertTrue(all(seen.lookup(digest) is True for digest in saved))
+        new = [get_urlhash_digest(f"http://b.ics.uci.edu/{i}")
+               for i in range(1000)]
+        self.assertTrue(all(seen.lookup(digest) is False for digest in new))
+        self.assertEqual(seen.maybe_hits, 0)
+
+    def test_shared_fingerprint_goes_to_the_save_file(self):
+        seen = SeenSet(100, 0.01)
+        first = b"\x01" * 8 + b"\x02" * 24
+        second = b"\x01" * 8 + b"\x03" * 24
+        seen.add(first)
+        self.assertIs(seen.lookup(second), False)
+        seen.add(second)
+        self.assertIsNone(seen.lookup(first))
+        self.assertIsNone(seen.lookup(second))
+
+    def test_incomplete_table_goes_to_the_save_file(self):
+        seen = SeenSet(100, 0.01)
+        digest = get_urlhash_digest("http://a.ics.uci.edu/")
+        seen.add(digest)
+        seen.complete = False
+        self.assertIsNone(seen.lookup(digest))
+
+
+class FingerprintTableTest(unittest.TestCase):
+    def test_grows_and_keeps_every_fingerprint(self):
+        table = FingerprintTable(1)
+        size = len(table.keys)
+        for fingerprint in range(1, 5000):
+            table.add(fingerprint, fingerprint & 0x7f)
+        self.assertGreater(len(table.keys), size)
+        self.assertEqual(len(table), 4999)
+        self.assertTrue(all(table.get(fingerprint) == fingerprint & 0x7f
+                            for fingerprint in range(1, 5000)))
+        self.assertIsNone(table.get(5000))
+
+    def test_different_check_marks_collision(self):
+        table = FingerprintTable(10)
+        table.add(42, 1)
+        table.add(42, 1)
+        self.assertEqual(table.get(42), 1)
+        table.add(42, 2)
+        self.assertEqual(table.get(42), COLLIDED)
+        self.assertEqual(len(table), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from crawler.storage import SQLiteStorage, PENDING, COMPLETE
+
+
+class LegacySaveFileTest(unittest.TestCase):
+    ''' Save files from before the fetch state was kept get its columns, and
+    their crawled urls are due on the first --recrawl. '''
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "frontier.db")
+        conn = sqlite3.connect(self.path)
+        with conn:
+            conn.execute(
+                "CREATE TABLE urls (urlhash TEXT PRIMARY KEY, "
+                "url TEXT NOT NULL, state INTEGER NOT NULL, "
+                "host TEXT NOT NULL, discovered_at REAL NOT NULL)")
+            conn.executemany("INSERT INTO urls VALUES (?, ?, ?, ?, ?)", [
+                ("a", "https://www.ics.uci.edu/a", COMPLETE, "www.ics.uci.edu", 0.0),
+                ("b", "https://www.ics.uci.edu/b", PENDING, "www.ics.uci.edu", 0.0),
+                ("c", "https://www.ics.uci.edu/c", COMPLETE, "www.ics.uci.edu", 0.0)])
+        conn.close()
+
+    def due(self, storage, now=100.0):
+        return [url for batch in storage.due_batches(now, 1) for url in batch]
+
+    def test_crawled_urls_are_due(self):
+        storage = SQLiteStorage(self.path)
+        self.addCleanup(storage.close)
+        self.assertEqual(list(storage.pending_batches(10)),
+                         [["https://www.ics.uci.edu/b"]])
+        self.assertEqual(self.due(storage), ["https://www.ics.uci.edu/a",
+                                             "https://www.ics.uci.edu/c"])
+
+    def test_backfill_runs_once(self):
+        storage = SQLiteStorage(self.path)
+        self.due(storage)
+        storage.put_fetch("a", (b"hash", 0.0, 50.0, 0, 200.0))
+        # Completed after the backfill, without a fetch state.
+        storage.put("b", "https://www.ics.uci.edu/b", True)
+        storage.close()
+        storage = SQLiteStorage(self.path)
+        self.addCleanup(storage.close)
+        self.assertEqual(self.due(storage), ["https://www.ics.uci.edu/c"])
+        self.assertEqual(storage.fetch_state("a"), (b"hash", 0.0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
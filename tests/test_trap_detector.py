@@ -0,0 +1,62 @@
+import random
+import unittest
+from unittest import mock
+
+import scraper
+from trap_detector import TrapDetector, url_template
+from utils.response import Response
+
+
+class TemplateTest(unittest.TestCase):
+    def test_numbers_share_a_template_and_words_do_not(self):
+        self.assertEqual(
+            url_template("https://www.ics.uci.edu/community/news/view_news?id=1"),
+            url_template("https://www.ics.uci.edu/community/news/view_news?id=2"))
+        self.assertNotEqual(
+            url_template("https://wiki.ics.uci.edu/doku.php?id=start"),
+            url_template("https://wiki.ics.uci.edu/doku.php?id=people"))
+
+    def test_parameter_order_does_not_matter(self):
+        self.assertEqual(
+            url_template("https://www.ics.uci.edu/a?x=1&y=2"),
+            url_template("https://www.ics.uci.edu/a?y=3&x=4"))
+
+
+class NoveltyTest(unittest.TestCase):
+    def setUp(self):
+        self.traps = TrapDetector(novelty_samples=5)
+        patcher = mock.patch.object(scraper, "traps", self.traps)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fetch(self, status, count):
+        for i in range(count):
+            url = f"https://www.ics.uci.edu/page?id={i}"
+            resp = Response({"url": url, "status": status, "error": "failed"})
+            self.assertEqual(scraper.extract_next_links(url, resp), [])
+        return url
+
+    def test_failed_fetches_do_not_block_a_template(self):
+        for status in (0, 413, 429, 503):
+            url = self.fetch(status, 30)
+            self.assertFalse(self.traps.is_blocked(url), status)
+
+    def test_pages_without_content_block_a_template(self):
+        url = self.fetch(404, 30)
+        self.assertTrue(self.traps.is_blocked(url))
+
+    def test_near_duplicate_pages_block_a_template(self):
+        for i in range(30):
+            url = f"https://www.ics.uci.edu/calendar?day={i}"
+            self.traps.record(url, 0xFFFF0000 | i)
+        self.assertTrue(self.traps.is_blocked(url))
+
+    def test_novel_pages_keep_a_template_open(self):
+        for i in range(10):
+            url = f"https://www.ics.uci.edu/people?id={i}"
+            self.traps.record(url, random.Random(i).getrandbits(64))
+        self.assertFalse(self.traps.is_blocked(url))
+
+
+if __name__ == "__main__":
+    unittest.main()
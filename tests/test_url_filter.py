@@ -0,0 +1,47 @@
+import unittest
+
+from url_filter import UrlFilter
+from benchmarks.bench_url_filter import reference_is_valid, make_urls
+
+
+class UrlFilterTest(unittest.TestCase):
+    def setUp(self):
+        self.url_filter = UrlFilter()
+
+    def test_same_verdicts_as_the_regex_is_valid(self):
+        urls = set(make_urls(20000, 5000)) | {
+            "https://www.ics.uci.edu/", "https://ICS.uci.edu/a.PDF",
+            "https://www.ics.uci.edu/a;jsessionid=1", "ftp://www.ics.uci.edu/",
+            "http://wiki.ics.uci.edu/doku.php", "https://www.ics.uci.edu/a.tar.gz",
+            "https://www.ics.uci.edu/~eppstein/pix/x"}
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.url_filter.is_valid(url),
+                                 reference_is_valid(url))
+
+    def test_variants_share_a_cache_entry(self):
+        for url in ("https://www.ics.uci.edu/about",
+                    "https://www.ics.uci.edu/about/",
+                    "https://WWW.ics.uci.edu/About#people"):
+            self.assertTrue(self.url_filter.is_valid(url))
+        info = self.url_filter._cached_check.cache_info()
+        self.assertEqual((info.misses, info.hits), (1, 2))
+
+    def test_blocked_path_without_trailing_slash(self):
+        self.assertFalse(self.url_filter.is_valid("https://www.ics.uci.edu/events/"))
+        self.assertFalse(self.url_filter.is_valid("https://www.ics.uci.edu/events"))
+        self.assertTrue(self.url_filter.is_valid("https://www.ics.uci.edu/eventsx"))
+
+    def test_config_rules(self):
+        url_filter = UrlFilter(allowed_hosts=["*.ics.uci.edu"], blocked_hosts=[],
+                               blocked_paths=["/private/"],
+                               blocked_extensions=["php"])
+        self.assertTrue(url_filter.is_valid("https://ics.uci.edu/a"))
+        self.assertTrue(url_filter.is_valid("https://vision.ics.uci.edu/a"))
+        self.assertFalse(url_filter.is_valid("https://www.cs.uci.edu/a"))
+        self.assertFalse(url_filter.is_valid("https://ics.uci.edu/private/a"))
+        self.assertFalse(url_filter.is_valid("https://ics.uci.edu/index.php"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,174 @@
+import re
+import threading
+from array import array
+from hashlib import blake2b
+from collections import OrderedDict, Counter, deque
+from functools import lru_cache
+from urllib.parse import urlsplit, parse_qsl
+
+# Hex digests, uuids and long random looking tokens such as session ids.
+HASH_SEGMENT = re.compile(
+    r"[0-9a-f]{16,}|[0-9a-f]{8}(?:-[0-9a-f]{4}){3}-[0-9a-f]{12}", re.IGNORECASE)
+TOKEN_SEGMENT = re.compile(r"(?=[^/]*\d)[A-Za-z0-9_\-]{24,}")
+DIGITS = re.compile(r"\d+")
+# Weight of the newest page in the novelty of its template.
+NOVELTY_WEIGHT = 0.1
+# Fingerprints of the last pages of a template that new pages are compared to.
+RECENT_FINGERPRINTS = 8
+
+
+def _generalize(segment):
+    if HASH_SEGMENT.fullmatch(segment):
+        return "<hash>"
+    if TOKEN_SEGMENT.fullmatch(segment):
+        return "<id>"
+    # Numbers, and with them dates like 2019-01-31, page2 or p_17.
+    return DIGITS.sub("<n>", segment)
+
+
+"""
+This url_template function maps a url to the template it was generated from:
+the host, then the path and the sorted query parameters with numbers, dates
+and hashes replaced by placeholders. So
+/calendar/2019-01-31?view=day&sid=9f86d081884c7d659a2feaa0c55ad015 and
+/calendar/2024-12-01?sid=a3f2b07c1e5d4f6a8b9c0d1e2f3a4b5c&view=day share the
+template host/calendar/<n>-<n>-<n>?sid=<hash>&view=day, while the pages of
+doku.php?id=start and doku.php?id=people keep templates of their own.
+"""
+@lru_cache(maxsize=65536)
+def url_template(url: str) -> str:
+    parsed = urlsplit(url)
+    segments = list()
+    for segment in parsed.path.split("/"):
+        # ;jsessionid=... and other path parameters.
+        segment = segment.partition(";")[0]
+        segments.append(_generalize(segment))
+    template = (parsed.hostname or "") + "/".join(segments)
+    parameters = sorted({
+        f"{key}={_generalize(value)}"
+        for key, value in parse_qsl(parsed.query, keep_blank_values=True)})
+    if parameters:
+        template += "?" + "&".join(parameters)
+    return template
+
+
+def has_repeated_segments(url: str, max_repeats: int) -> bool:
+    # /a/b/a/b/a/b style paths, usually from relative links resolved
+    # against the wrong base.
+    segments = [segment for segment in urlsplit(url).path.split("/") if segment]
+    if len(segments) <= max_repeats:
+        return False
+    return Counter(segments).most_common(1)[0][1] > max_repeats
+
+
+class CountMinSketch(object):
+    ''' Approximate counts in a fixed depth x width table of counters. A
+    count is never underestimated, and overestimated by at most about
+    e / width of the total with high probability. Uses conservative update,
+    only the smallest counters are incremented. '''
+    def __init__(self, width=65536, depth=4):
+        self.width = width
+        self.depth = depth
+        self.table = [array("I", bytes(4 * width)) for _ in range(depth)]
+
+    def _indexes(self, key):
+        digest = blake2b(key.encode("utf-8"), digest_size=4 * self.depth).digest()
+        return [int.from_bytes(digest[4 * row:4 * row + 4], "little") % self.width
+                for row in range(self.depth)]
+
+    def add(self, key):
+        # Counts key once more and returns its new estimate.
+        indexes = self._indexes(key)
+        count = min(row[index] for row, index in zip(self.table, indexes)) + 1
+        for row, index in zip(self.table, indexes):
+            if row[index] < count:
+                row[index] = count
+        return count
+
+    def estimate(self, key):
+        return min(row[index]
+                   for row, index in zip(self.table, self._indexes(key)))
+
+
+class _TemplateStats(object):
+    __slots__ = ("samples", "novelty", "recent", "blocked")
+
+    def __init__(self):
+        self.samples = 0
+        self.novelty = 1.0
+        self.recent = deque(maxlen=RECENT_FINGERPRINTS)
+        self.blocked = False
+
+
+class TrapDetector(object):
+    ''' Stops crawling url templates that look like traps. A template is
+    blocked once more than budget of its pages were fetched, or once its
+    pages keep looking like the ones before them: errors, duplicates, or
+    within novelty_distance bits of a recent page of the same template.
+
+    Fetch counts are kept in a count-min sketch, so the budget holds for
+    every template in a fixed amount of memory. Novelty is tracked for the
+    max_templates most recently fetched templates in an LRU. '''
+    def __init__(self, budget=5000, min_novelty=0.1, novelty_samples=20,
+                 novelty_distance=10, max_repeats=2, max_templates=100000):
+        self.budget = budget
+        self.min_novelty = min_novelty
+        self.novelty_samples = novelty_samples
+        self.novelty_distance = novelty_distance
+        self.max_repeats = max_repeats
+        self.max_templates = max_templates
+        self.fetches = CountMinSketch()
+        self.templates = OrderedDict()
+        self.blocked_templates = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config.trap_template_budget, config.trap_min_novelty,
+                   config.trap_novelty_samples, config.trap_novelty_distance,
+                   config.trap_max_repeated_segments, config.trap_max_templates)
+
+    def _stats(self, template):
+        stats = self.templates.get(template)
+        if stats is None:
+            stats = self.templates[template] = _TemplateStats()
+            if len(self.templates) > self.max_templates:
+                self.templates.popitem(last=False)
+        else:
+            self.templates.move_to_end(template)
+        return stats
+
+    def record(self, url, fingerprint=None):
+        ''' Counts a fetched page of url's template. fingerprint is the SimHash
+        of the page, or None if it had no new content. Returns the template if
+        this page got it blocked, otherwise None. '''
+        template = url_template(url)
+        with self.lock:
+            fetches = self.fetches.add(template)
+            stats = self._stats(template)
+            novel = fingerprint is not None and all(
+                bin(fingerprint ^ recent).count("1") > self.novelty_distance
+                for recent in stats.recent)
+            if fingerprint is not None:
+                stats.recent.append(fingerprint)
+            stats.samples += 1
+            stats.novelty += (novel - stats.novelty) * NOVELTY_WEIGHT
+            if stats.blocked:
+                return None
+            if fetches > self.budget or (
+                    stats.samples >= self.novelty_samples
+                    and stats.novelty < self.min_novelty):
+                stats.blocked = True
+                self.blocked_templates += 1
+                return template
+        return None
+
+    def is_blocked(self, url):
+        if has_repeated_segments(url, self.max_repeats):
+            return True
+        template = url_template(url)
+        with self.lock:
+            if self.fetches.estimate(template) > self.budget:
+                return True
+            stats = self.templates.get(template)
+            return stats is not None and stats.blocked
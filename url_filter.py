@@ -0,0 +1,134 @@
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+from utils import normalize
+from html_extractor import defragment
+
+# Rules used when config.ini has no [FILTER] section.
+DEFAULT_BLOCKED_HOSTS = [
+    "swiki.ics.uci.edu", "calendar.ics.uci.edu", "ngs.ics.uci.edu",
+    "grape.ics.uci.edu", "isg.ics.uci.edu", "intranet.ics.uci.edu",
+    "wics.ics.uci.edu", "wiki.ics.uci.edu", "www.cs.jhu.edu", "cs.jhu.edu",
+    "www.physics.uci.edu", "doi.org", "dx.doi.org", "arxiv.org",
+    "ieeexplore.ieee.org", "www.cs.cmu.edu", "cs.cmu.edu", "www.cecs.uci.edu"]
+DEFAULT_BLOCKED_PATHS = ["/~eppstein/pix/", "/events/"]
+DEFAULT_BLOCKED_EXTENSIONS = [
+    "css", "js", "bmp", "gif", "jpeg", "jpg", "ico", "png", "tif", "tiff",
+    "mid", "mp2", "mp3", "mp4", "wav", "avi", "mov", "mpeg", "ram", "m4v",
+    "mkv", "ogg", "ogv", "pdf", "ps", "eps", "tex", "ppt", "pptx", "doc",
+    "docx", "xls", "xlsx", "names", "data", "dat", "exe", "bz2", "tar", "msi",
+    "bin", "7z", "psd", "dmg", "iso", "epub", "dll", "cnf", "tgz", "sha1",
+    "thmx", "mso", "arff", "rtf", "jar", "csv", "rm", "smil", "wmv", "swf",
+    "wma", "zip", "rar", "gz"]
+
+SCHEMES = frozenset(["http", "https"])
+
+
+class HostRules(object):
+    ''' Exact host names and wildcards like *.ics.uci.edu, which match the
+    domain itself and every subdomain of it. '''
+    def __init__(self, rules):
+        self.exact = set()
+        self.wildcards = set()
+        for rule in rules:
+            rule = rule.strip().lower()
+            if rule.startswith("*."):
+                self.wildcards.add(rule[2:])
+            elif rule:
+                self.exact.add(rule)
+
+    def __bool__(self):
+        return bool(self.exact or self.wildcards)
+
+    def matches(self, host):
+        if host in self.exact:
+            return True
+        if self.wildcards:
+            # Checks every suffix of the host that starts at a label.
+            labels = host.split(".")
+            for i in range(len(labels)):
+                if ".".join(labels[i:]) in self.wildcards:
+                    return True
+        return False
+
+
+class PrefixTrie(object):
+    ''' Character trie answering whether a string starts with any prefix. '''
+    def __init__(self, prefixes):
+        self.root = dict()
+        for prefix in prefixes:
+            node = self.root
+            for char in prefix.strip().lower():
+                node = node.setdefault(char, dict())
+            node[None] = True
+
+    def matches(self, text):
+        node = self.root
+        if None in node:
+            return True
+        for char in text:
+            node = node.get(char)
+            if node is None:
+                return False
+            if None in node:
+                return True
+        return False
+
+
+class UrlFilter(object):
+    ''' Precompiled version of the is_valid rules. Verdicts are cached per
+    normalized url in a bounded LRU, since the same links are found on many
+    pages. '''
+    def __init__(self, allowed_hosts=(), blocked_hosts=DEFAULT_BLOCKED_HOSTS,
+                 blocked_paths=DEFAULT_BLOCKED_PATHS,
+                 blocked_extensions=DEFAULT_BLOCKED_EXTENSIONS,
+                 cache_size=100000):
+        self.allowed_hosts = HostRules(allowed_hosts)
+        self.blocked_hosts = HostRules(blocked_hosts)
+        self.blocked_paths = PrefixTrie(blocked_paths)
+        self.blocked_extensions = frozenset(
+            extension.strip().lower().lstrip(".")
+            for extension in blocked_extensions)
+        self._cached_check = lru_cache(maxsize=cache_size)(self._check)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            config.allowed_hosts,
+            DEFAULT_BLOCKED_HOSTS if config.blocked_hosts is None
+            else config.blocked_hosts,
+            DEFAULT_BLOCKED_PATHS if config.blocked_paths is None
+            else config.blocked_paths,
+            DEFAULT_BLOCKED_EXTENSIONS if config.blocked_extensions is None
+            else config.blocked_extensions,
+            config.filter_cache_size)
+
+    def is_valid(self, url):
+        # The rules ignore the fragment, trailing slashes and case, so every
+        # variant of a url shares one cache entry.
+        if "#" in url:
+            url = defragment(url)
+        return self._cached_check(normalize(url).lower())
+
+    def _check(self, url):
+        parsed = urlsplit(url)
+        if parsed.scheme not in SCHEMES:
+            return False
+        host = parsed.hostname or ""
+        if self.allowed_hosts and not self.allowed_hosts.matches(host):
+            return False
+        if self.blocked_hosts.matches(host):
+            return False
+        # urlparse moves the ;params of the last segment out of the path.
+        path = parsed.path
+        params = path.find(";", path.rfind("/"))
+        if params >= 0:
+            path = path[:params]
+        path = path.lower()
+        # Urls are checked without their trailing slash, so a blocked /events/
+        # also blocks /events, which is what a link to /events/ is crawled as.
+        if self.blocked_paths.matches(path + "/"):
+            return False
+        # Same as matching r".*\.(ext|...)$" against the path.
+        _, dot, extension = path.rpartition(".")
+        return not (dot and extension in self.blocked_extensions)
@@ -1,33 +1,31 @@
-import os
-import logging
 from hashlib import sha256
 from urllib.parse import urlparse
 
+from utils import log_writer
+from utils.log_writer import PER_PAGE
+
+
 def get_logger(name, filename=None):
-    logger = logging.getLogger(name)
-    logger.setLevel(logging.INFO)
-    if not os.path.exists("Logs"):
-        os.makedirs("Logs")
-    fh = logging.FileHandler(f"Logs/{filename if filename else name}.log")
-    fh.setLevel(logging.DEBUG)
-    ch = logging.StreamHandler()
-    ch.setLevel(logging.INFO)
-    formatter = logging.Formatter(
-       "%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-    fh.setFormatter(formatter)
-    ch.setFormatter(formatter)
-    # add the handlers to the logger
-    logger.addHandler(fh)
-    logger.addHandler(ch)
-    return logger
+    # Logs to the console and to Logs/<filename or name>.log, through the
+    # background writer in utils/log_writer.py.
+    return log_writer.pipeline.get_logger(name, filename)
 
 
-def get_urlhash(url):
+def configure_logging(config):
+    # Applies the [LOGGING] settings to every logger, old and new.
+    log_writer.pipeline.configure(config)
+
+
+def get_urlhash_digest(url):
     parsed = urlparse(url)
     # everything other than scheme.
     return sha256(
         f"{parsed.netloc}/{parsed.path}/{parsed.params}/"
-        f"{parsed.query}/{parsed.fragment}".encode("utf-8")).hexdigest()
+        f"{parsed.query}/{parsed.fragment}".encode("utf-8")).digest()
+
+
+def get_urlhash(url):
+    return get_urlhash_digest(url).hex()
 
 def normalize(url):
     if url.endswith("/"):
@@ -1,19 +1,127 @@
 import re
 
+from utils import get_logger
+
+
+def _split(value):
+    # Comma separated list, or None if the option is not set.
+    if value is None:
+        return None
+    return [item.strip() for item in value.split(",") if item.strip()]
+
 
 class Config(object):
     def __init__(self, config):
         self.user_agent = config["IDENTIFICATION"]["USERAGENT"].strip()
-        print (self.user_agent)
+        get_logger("CONFIG").info(f"User agent: {self.user_agent}")
         assert self.user_agent != "DEFAULT AGENT", "Set useragent in config.ini"
         assert re.match(r"^[a-zA-Z0-9_ ,]+$", self.user_agent), "User agent should not have any special characters outside '_', ',' and 'space'"
         self.threads_count = int(config["LOCAL PROPERTIES"]["THREADCOUNT"])
+        self.min_threads_count = int(config["LOCAL PROPERTIES"].get(
+            "MIN_THREADCOUNT", self.threads_count))
         self.save_file = config["LOCAL PROPERTIES"]["SAVE"]
+        self.parse_processes = int(
+            config["LOCAL PROPERTIES"].get("PARSE_PROCESSES", 0))
 
         self.host = config["CONNECTION"]["HOST"]
         self.port = int(config["CONNECTION"]["PORT"])
+        connection = config["CONNECTION"]
+        self.connect_timeout = float(connection.get("CONNECT_TIMEOUT", 5))
+        self.read_timeout = float(connection.get("READ_TIMEOUT", 30))
+        self.retries = int(connection.get("RETRIES", 3))
+        self.retry_backoff = float(connection.get("RETRY_BACKOFF", 0.5))
+        self.max_download_bytes = int(
+            connection.get("MAX_DOWNLOAD_BYTES", 4 * 1024 * 1024))
 
         self.seed_urls = config["CRAWLER"]["SEEDURL"].split(",")
         self.time_delay = float(config["CRAWLER"]["POLITENESS"])
+        # POLITENESS is the minimum, hosts that error out or slow down wait
+        # up to MAX_POLITENESS.
+        self.max_time_delay = float(
+            config["CRAWLER"].get("MAX_POLITENESS", 60))
+        self.backoff = float(config["CRAWLER"].get("BACKOFF", 2))
+        self.latency_backoff = float(
+            config["CRAWLER"].get("LATENCY_BACKOFF", 2))
+        self.extractor = config["CRAWLER"].get("EXTRACTOR", "stream").strip().lower()
+        self.near_duplicate_distance = int(
+            config["CRAWLER"].get("NEAR_DUPLICATE_DISTANCE", 3))
+
+        recrawl = config["RECRAWL"] if "RECRAWL" in config else {}
+        self.min_revisit_interval = float(
+            recrawl.get("MIN_REVISIT_INTERVAL", 3600))
+        self.max_revisit_interval = float(
+            recrawl.get("MAX_REVISIT_INTERVAL", 30 * 24 * 3600))
+        # Set by launch.py --recrawl.
+        self.recrawl = False
+
+        engine = config["ASYNC"] if "ASYNC" in config else {}
+        self.async_concurrency = int(engine.get("CONCURRENCY", 200))
+        self.async_per_host = int(engine.get("PER_HOST", 2))
+
+        storage = config["STORAGE"] if "STORAGE" in config else {}
+        self.storage = storage.get("BACKEND", "shelve").strip().lower()
+        self.batch_size = int(storage.get("BATCH_SIZE", 500))
+        self.flush_interval = int(storage.get("FSYNC_INTERVAL_MS", 200)) / 1000
+        self.seen_capacity = int(storage.get("SEEN_CAPACITY", 1000000))
+        self.seen_error_rate = float(storage.get("SEEN_ERROR_RATE", 0.01))
+        self.resume_batch_size = int(storage.get("RESUME_BATCH_SIZE", 1000))
+        self.revalidate_on_resume = str(
+            storage.get("REVALIDATE_ON_RESUME", "true")).strip().lower() == "true"
+
+        url_filter = config["FILTER"] if "FILTER" in config else {}
+        self.allowed_hosts = _split(url_filter.get("ALLOWED_HOSTS", ""))
+        self.blocked_hosts = _split(url_filter.get("BLOCKED_HOSTS"))
+        self.blocked_paths = _split(url_filter.get("BLOCKED_PATHS"))
+        self.blocked_extensions = _split(url_filter.get("BLOCKED_EXTENSIONS"))
+        self.filter_cache_size = int(url_filter.get("CACHE_SIZE", 100000))
+
+        traps = config["TRAPS"] if "TRAPS" in config else {}
+        self.trap_template_budget = int(traps.get("TEMPLATE_BUDGET", 5000))
+        self.trap_min_novelty = float(traps.get("MIN_NOVELTY", 0.1))
+        self.trap_novelty_samples = int(traps.get("NOVELTY_SAMPLES", 20))
+        self.trap_novelty_distance = int(traps.get("NOVELTY_DISTANCE", 10))
+        self.trap_max_repeated_segments = int(
+            traps.get("MAX_REPEATED_SEGMENTS", 2))
+        self.trap_max_templates = int(traps.get("MAX_TEMPLATES", 100000))
+
+        pages = config["PAGE_STORE"] if "PAGE_STORE" in config else {}
+        self.page_store_dir = pages.get("DIRECTORY", "").strip()
+        self.page_store_segment_bytes = int(
+            pages.get("SEGMENT_MB", 256)) * 1024 * 1024
+        self.page_store_compression_level = int(
+            pages.get("COMPRESSION_LEVEL", 6))
+
+        report = config["REPORT"] if "REPORT" in config else {}
+        self.report_file = report.get("FILE", "report.txt")
+        self.report_interval = float(report.get("INTERVAL", 10))
+        self.report_every_pages = int(report.get("EVERY_PAGES", 500))
+
+        logs = config["LOGGING"] if "LOGGING" in config else {}
+        self.log_level = logs.get("LEVEL", "INFO").strip().upper()
+        self.log_max_bytes = int(logs.get("MAX_BYTES", 10 * 1024 * 1024))
+        self.log_backup_count = int(logs.get("BACKUP_COUNT", 5))
+        self.log_buffer_size = int(logs.get("BUFFER_SIZE", 65536))
+        self.log_flush_interval = float(
+            logs.get("FLUSH_INTERVAL_MS", 1000)) / 1000
+        self.log_per_page_every = int(logs.get("PER_PAGE_EVERY", 1))
+        self.log_per_page_max_per_second = float(
+            logs.get("PER_PAGE_MAX_PER_SECOND", 50))
+
+        metrics = config["METRICS"] if "METRICS" in config else {}
+        self.metrics_port = int(metrics.get("PORT", 0))
+        self.metrics_file = metrics.get("SNAPSHOT_FILE", "")
+        self.metrics_interval = float(metrics.get("SNAPSHOT_INTERVAL", 30))
+
+        distributed = config["DISTRIBUTED"] if "DISTRIBUTED" in config else {}
+        self.partitions = int(distributed.get("PARTITIONS", 1))
+        # Which partition this process runs, set by crawler.distributed.
+        self.partition = 0
+        self.partition_addresses = _split(distributed.get("ADDRESSES", ""))
+        self.partition_base_port = int(distributed.get("BASE_PORT", 7300))
+        self.partition_authkey = distributed.get(
+            "AUTHKEY", "crawler").encode("utf-8")
+        self.forward_batch_size = int(distributed.get("FORWARD_BATCH_SIZE", 200))
+        self.forward_interval = float(
+            distributed.get("FORWARD_INTERVAL_MS", 100)) / 1000
 
         self.cache_server = None
\ No newline at end of file
@@ -2,20 +2,93 @@ import requests
 import cbor
 import time
 
+from threading import Lock
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
 from utils.response import Response
 
+# Status used when the cache server could not be reached at all.
+CONNECTION_ERROR_STATUS = 0
+# Status used when the response exceeded MAX_DOWNLOAD_BYTES.
+TOO_LARGE_STATUS = 413
+# Statuses after which a host is given more time: no answer from the cache
+# server, too many requests and server errors.
+BACKOFF_STATUSES = frozenset(
+    [CONNECTION_ERROR_STATUS, 429] + list(range(500, 600)))
+
+_session = None
+_session_lock = Lock()
+
+def get_session(config):
+    # One session shared by all workers, so connections to the cache server
+    # are kept alive and reused instead of opened for every url.
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=config.retries, connect=config.retries,
+                read=config.retries, status=config.retries,
+                status_forcelist=(500, 502, 503, 504),
+                backoff_factor=config.retry_backoff,
+                allowed_methods=frozenset(["GET"]),
+                raise_on_status=False)
+            adapter = HTTPAdapter(
+                pool_connections=1, pool_maxsize=config.threads_count,
+                pool_block=True, max_retries=retry)
+            session = requests.Session()
+            session.mount("http://", adapter)
+            _session = session
+    return _session
+
+def read_capped(resp, max_bytes):
+    # Returns the body, or None as soon as it is known to exceed max_bytes.
+    length = resp.headers.get("Content-Length", "")
+    if length.isdigit() and int(length) > max_bytes:
+        return None
+    chunks = list()
+    size = 0
+    for chunk in resp.iter_content(64 * 1024):
+        size += len(chunk)
+        if size > max_bytes:
+            return None
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+def _error_response(url, status, error, start, logger):
+    if logger:
+        logger.error(error)
+    response = Response({"error": error, "status": status, "url": url})
+    response.latency = time.perf_counter() - start
+    return response
+
 def download(url, config, logger=None):
     host, port = config.cache_server
-    resp = requests.get(
-        f"http://{host}:{port}/",
-        params=[("q", f"{url}"), ("u", f"{config.user_agent}")])
+    start = time.perf_counter()
+    try:
+        # Streamed, so oversized responses are dropped without reading them.
+        with get_session(config).get(
+                f"http://{host}:{port}/",
+                params=[("q", f"{url}"), ("u", f"{config.user_agent}")],
+                timeout=(config.connect_timeout, config.read_timeout),
+                stream=True) as resp:
+            content = read_capped(resp, config.max_download_bytes)
+    except requests.RequestException as e:
+        return _error_response(
+            url, CONNECTION_ERROR_STATUS,
+            f"Spacetime connection error {e} with url {url}.", start, logger)
+    if content is None:
+        return _error_response(
+            url, TOO_LARGE_STATUS,
+            f"Response larger than {config.max_download_bytes} bytes "
+            f"with url {url}.", start, logger)
     try:
-        if resp and resp.content:
-            return Response(cbor.loads(resp.content))
+        if resp and content:
+            response = Response(cbor.loads(content))
+            response.latency = time.perf_counter() - start
+            return response
     except (EOFError, ValueError) as e:
         pass
-    logger.error(f"Spacetime Response error {resp} with url {url}.")
-    return Response({
-        "error": f"Spacetime Response error {resp} with url {url}.",
-        "status": resp.status_code,
-        "url": url})
+    return _error_response(
+        url, resp.status_code,
+        f"Spacetime Response error {resp} with url {url}.", start, logger)
@@ -0,0 +1,218 @@
+import os
+import time
+import atexit
+import logging
+import threading
+from queue import SimpleQueue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_DIR = "Logs"
+FORMATTER = logging.Formatter(
+    "%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+# Pass as extra= to mark a message logged for every page, so it is sampled.
+PER_PAGE = {"per_page": True}
+
+
+class BufferedRotatingFileHandler(RotatingFileHandler):
+    ''' RotatingFileHandler that writes through a buffer of buffer_size bytes
+    and only flushes when flush is called, instead of after every record. '''
+    def __init__(self, filename, max_bytes=0, backup_count=0,
+                 buffer_size=65536):
+        self.buffer_size = buffer_size
+        super().__init__(filename, maxBytes=max_bytes,
+                         backupCount=backup_count, encoding="utf-8", delay=True)
+        self.size = (os.path.getsize(self.baseFilename)
+                     if os.path.exists(self.baseFilename) else 0)
+
+    def _open(self):
+        return open(self.baseFilename, self.mode, encoding=self.encoding,
+                    buffering=self.buffer_size)
+
+    def shouldRollover(self, record):
+        # Counted in emit, as seeking the stream would flush the buffer.
+        return 0 < self.maxBytes <= self.size
+
+    def doRollover(self):
+        super().doRollover()
+        self.size = 0
+
+    def emit(self, record):
+        try:
+            if self.shouldRollover(record):
+                self.doRollover()
+            if self.stream is None:
+                self.stream = self._open()
+            message = self.format(record) + self.terminator
+            self.stream.write(message)
+            self.size += len(message)
+        except Exception:
+            self.handleError(record)
+
+
+class PerPageSampler(logging.Filter):
+    ''' Lets through one in every `every` per page records, and at most
+    max_per_second of them (0 for no limit). Warnings, errors and other
+    records always pass. '''
+    def __init__(self, every=1, max_per_second=0):
+        super().__init__()
+        self.every = every
+        self.max_per_second = max_per_second
+        self.count = 0
+        self.tokens = max_per_second
+        self.last = time.monotonic()
+        self.dropped = 0
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno > logging.INFO or not getattr(record, "per_page", False):
+            return True
+        with self.lock:
+            self.count += 1
+            if self.every > 1 and self.count % self.every:
+                self.dropped += 1
+                return False
+            if self.max_per_second > 0:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.max_per_second,
+                    self.tokens + (now - self.last) * self.max_per_second)
+                self.last = now
+                if self.tokens < 1:
+                    self.dropped += 1
+                    return False
+                self.tokens -= 1
+        return True
+
+
+class _FileQueueHandler(QueueHandler):
+    # Tags each record with the log file of its logger. The queue never
+    # leaves the process, so records are not copied or formatted here but on
+    # the writer thread.
+    def __init__(self, queue, log_file):
+        super().__init__(queue)
+        self.log_file = log_file
+
+    def prepare(self, record):
+        record.log_file = self.log_file
+        return record
+
+
+class _LogWriter(logging.Handler):
+    ''' Runs on the listener thread. Writes every record to the console and
+    to its log file, and flushes the files once the queue is drained, or
+    every flush_interval seconds while it is not. '''
+    def __init__(self, pipeline):
+        super().__init__()
+        self.pipeline = pipeline
+        self.console = logging.StreamHandler()
+        self.console.setFormatter(FORMATTER)
+        self.files = dict()
+        self.generation = pipeline.generation
+        self.last_flush = time.monotonic()
+
+    def _file(self, log_file):
+        pipeline = self.pipeline
+        if self.generation != pipeline.generation:
+            # Reopened with the new settings.
+            self.generation = pipeline.generation
+            self.close_files()
+        path = os.path.join(LOG_DIR, f"{log_file}{pipeline.suffix}.log")
+        handler = self.files.get(path)
+        if handler is None:
+            os.makedirs(LOG_DIR, exist_ok=True)
+            handler = self.files[path] = BufferedRotatingFileHandler(
+                path, pipeline.max_bytes, pipeline.backup_count,
+                pipeline.buffer_size)
+            handler.setFormatter(FORMATTER)
+        return handler
+
+    def emit(self, record):
+        self.console.emit(record)
+        self._file(record.log_file).emit(record)
+        if (self.pipeline.queue.empty() or time.monotonic() - self.last_flush
+                > self.pipeline.flush_interval):
+            self.flush()
+
+    def flush(self):
+        for handler in self.files.values():
+            handler.flush()
+        self.last_flush = time.monotonic()
+
+    def close_files(self):
+        for handler in self.files.values():
+            handler.close()
+        self.files.clear()
+
+    def close(self):
+        self.close_files()
+        super().close()
+
+
+class LogPipeline(object):
+    ''' Loggers put their records on one queue and a single background thread
+    writes them, so workers never wait on a file or the console. Every
+    logger gets its handler once, however often get_logger is called. '''
+    def __init__(self):
+        self.queue = SimpleQueue()
+        self.level = logging.INFO
+        self.sampler = PerPageSampler()
+        self.suffix = ""
+        self.max_bytes = 0
+        self.backup_count = 0
+        self.buffer_size = 65536
+        self.flush_interval = 1.0
+        # Bumped by configure so the writer reopens its files.
+        self.generation = 0
+        self.loggers = dict()
+        self.writer = None
+        self.listener = None
+        self.lock = threading.Lock()
+
+    def _start(self):
+        # Called with the lock held.
+        if self.listener is None:
+            self.writer = _LogWriter(self)
+            self.listener = QueueListener(self.queue, self.writer)
+            self.listener.start()
+            atexit.register(self.stop)
+
+    def get_logger(self, name, filename=None):
+        with self.lock:
+            logger = self.loggers.get(name)
+            if logger is None:
+                self._start()
+                logger = self.loggers[name] = logging.getLogger(name)
+                logger.setLevel(self.level)
+                logger.propagate = False
+                handler = _FileQueueHandler(self.queue, filename or name)
+                handler.addFilter(self.sampler)
+                logger.addHandler(handler)
+            return logger
+
+    def configure(self, config):
+        with self.lock:
+            self.level = logging.getLevelName(config.log_level)
+            for logger in self.loggers.values():
+                logger.setLevel(self.level)
+            self.sampler.every = config.log_per_page_every
+            self.sampler.max_per_second = self.sampler.tokens = (
+                config.log_per_page_max_per_second)
+            self.max_bytes = config.log_max_bytes
+            self.backup_count = config.log_backup_count
+            self.buffer_size = config.log_buffer_size
+            self.flush_interval = config.log_flush_interval
+            # Partitions of a distributed crawl rotate their own files.
+            self.suffix = (f".part{config.partition}"
+                           if config.partitions > 1 else "")
+            self.generation += 1
+
+    def stop(self):
+        # Writes out everything still queued and closes the files.
+        with self.lock:
+            listener, self.listener = self.listener, None
+        if listener is not None:
+            listener.stop()
+            self.writer.close()
+
+
+pipeline = LogPipeline()
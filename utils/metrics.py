@@ -0,0 +1,244 @@
+import os
+import json
+import time
+import bisect
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from utils import get_logger
+
+# Upper bounds in seconds, from 10 microseconds (most lock waits) to half a
+# minute (slow downloads).
+BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+           0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram(object):
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(BUCKETS, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation.
+        with self.lock:
+            counts, total = list(self.counts), self.count
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for bound, count in zip(BUCKETS + (float("inf"),), counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def cumulative(self):
+        with self.lock:
+            counts = list(self.counts)
+        total = 0
+        for count in counts:
+            total += count
+            yield total
+
+
+class Counter(object):
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+
+class Registry(object):
+    ''' Histograms, counters and gauges keyed by name and labels. Gauges are
+    callbacks, read only when the metrics are exported. '''
+    def __init__(self):
+        self.histograms = dict()
+        self.counters = dict()
+        self.gauges = dict()
+        self.lock = threading.Lock()
+
+    def _get(self, metrics, factory, name, labels):
+        key = (name, tuple(sorted(labels.items())))
+        metric = metrics.get(key)
+        if metric is None:
+            with self.lock:
+                metric = metrics.get(key)
+                if metric is None:
+                    metric = metrics[key] = factory()
+        return metric
+
+    def histogram(self, name, **labels):
+        return self._get(self.histograms, Histogram, name, labels)
+
+    def counter(self, name, **labels):
+        return self._get(self.counters, Counter, name, labels)
+
+    def gauge(self, name, callback, **labels):
+        self.gauges[(name, tuple(sorted(labels.items())))] = callback
+
+    def render_prometheus(self):
+        lines = list()
+        for kind, metrics in (("histogram", self.histograms),
+                              ("counter", self.counters),
+                              ("gauge", self.gauges)):
+            typed = set()
+            for (name, labels), metric in sorted(
+                    list(metrics.items()), key=lambda item: item[0]):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} {kind}")
+                    typed.add(name)
+                if kind == "histogram":
+                    for bound, total in zip(
+                            BUCKETS + ("+Inf",), metric.cumulative()):
+                        lines.append(
+                            f"{name}_bucket"
+                            f"{_labels(labels + (('le', bound),))} {total}")
+                    lines.append(f"{name}_sum{_labels(labels)} {metric.sum}")
+                    lines.append(f"{name}_count{_labels(labels)} {metric.count}")
+                elif kind == "counter":
+                    lines.append(f"{name}{_labels(labels)} {metric.value}")
+                else:
+                    lines.append(f"{name}{_labels(labels)} {_read(metric)}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        result = {"time": time.time(), "histograms": [], "counters": [], "gauges": []}
+        for (name, labels), metric in list(self.histograms.items()):
+            result["histograms"].append({
+                "name": name, "labels": dict(labels), "count": metric.count,
+                "sum": metric.sum, "p50": metric.quantile(0.5),
+                "p99": metric.quantile(0.99)})
+        for (name, labels), metric in list(self.counters.items()):
+            result["counters"].append(
+                {"name": name, "labels": dict(labels), "value": metric.value})
+        for (name, labels), callback in list(self.gauges.items()):
+            result["gauges"].append(
+                {"name": name, "labels": dict(labels), "value": _read(callback)})
+        return result
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+def _read(callback):
+    try:
+        return callback()
+    except Exception:
+        return float("nan")
+
+
+registry = Registry()
+
+
+def observe(stage, seconds):
+    registry.histogram("crawler_stage_seconds", stage=stage).observe(seconds)
+
+
+def inc(name, amount=1, **labels):
+    registry.counter(name, **labels).inc(amount)
+
+
+def gauge(name, callback, **labels):
+    registry.gauge(name, callback, **labels)
+
+
+class timer(object):
+    ''' with timer("parse"): ... records the time spent in the block. '''
+    def __init__(self, stage):
+        self.histogram = registry.histogram("crawler_stage_seconds", stage=stage)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class TimedLock(object):
+    ''' Wraps a lock so that every with block records how long it waited to
+    acquire it. '''
+    def __init__(self, lock, name):
+        self.lock = lock
+        self.histogram = registry.histogram("crawler_lock_wait_seconds", lock=name)
+
+    def __enter__(self):
+        start = time.perf_counter()
+        self.lock.acquire()
+        self.histogram.observe(time.perf_counter() - start)
+
+    def __exit__(self, *exc_info):
+        self.lock.release()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MetricsExporter(object):
+    ''' Serves /metrics in the Prometheus text format on [METRICS] PORT (if
+    not 0) and writes a JSON snapshot to SNAPSHOT_FILE every
+    SNAPSHOT_INTERVAL seconds (if set). '''
+    def __init__(self, config):
+        self.logger = get_logger("METRICS")
+        self.config = config
+        self.server = None
+        self.stopped = threading.Event()
+        self.snapshot_thread = None
+
+    def start(self):
+        if self.config.metrics_port:
+            self.server = ThreadingHTTPServer(
+                ("127.0.0.1", self.config.metrics_port), _MetricsHandler)
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+            self.logger.info(
+                f"Serving metrics on http://127.0.0.1:{self.config.metrics_port}/metrics")
+        if self.config.metrics_file:
+            self.snapshot_thread = threading.Thread(
+                target=self._snapshot_loop, daemon=True)
+            self.snapshot_thread.start()
+
+    def _snapshot_loop(self):
+        while not self.stopped.wait(self.config.metrics_interval):
+            self.write_snapshot()
+
+    def write_snapshot(self):
+        tmp_path = f"{self.config.metrics_file}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(registry.snapshot(), f, indent=1)
+        # Renamed into place so readers never see a partial file.
+        os.replace(tmp_path, self.config.metrics_file)
+
+    def stop(self):
+        self.stopped.set()
+        if self.snapshot_thread:
+            self.snapshot_thread.join()
+            self.write_snapshot()
+        if self.server:
+            self.server.shutdown()
@@ -1,14 +1,42 @@
+import time
 import pickle
 
+from utils import metrics
+
 class Response(object):
     def __init__(self, resp_dict):
         self.url = resp_dict["url"]
         self.status = resp_dict["status"]
         self.error = resp_dict["error"] if "error" in resp_dict else None
-        try:
-            self.raw_response = (
-                pickle.loads(resp_dict["response"])
-                if "response" in resp_dict else
-                None)
-        except TypeError:
-            self.raw_response = None
+        # Seconds spent fetching from the cache server, set by download.
+        self.latency = None
+        # The pickled response is only decoded the first time raw_response
+        # is used, so pages rejected on their status are never unpickled.
+        self._pickled = resp_dict["response"] if "response" in resp_dict else None
+        self._raw_response = None
+
+    @property
+    def raw_response(self):
+        if self._pickled is not None:
+            start = time.perf_counter()
+            try:
+                self._raw_response = pickle.loads(self._pickled)
+            except (TypeError, ValueError, EOFError, pickle.UnpicklingError):
+                self._raw_response = None
+            metrics.observe("decode", time.perf_counter() - start)
+            # Only the decoded copy of the page is kept from here on.
+            self._pickled = None
+        return self._raw_response
+
+    @property
+    def content_view(self):
+        # The page content without copying it, or None if there is none.
+        raw_response = self.raw_response
+        if raw_response is None or raw_response.content is None:
+            return None
+        return memoryview(raw_response.content)
+
+    def release(self):
+        # Drops the page once it has been parsed.
+        self._pickled = None
+        self._raw_response = None